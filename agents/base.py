@@ -9,6 +9,8 @@ Message = Dict[str, str] #the way that the whole system present messages
 class AgentResult:
     content: str
     messages: List[Message]|None = None # memory optional
+    ttft_s: float|None = None # time to first token, only set when the answer was streamed
+    context: Dict|None = None # ContextPacker report when the prompt had to be truncated
 
 class Agent(Protocol):
     name: str
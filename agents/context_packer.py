@@ -0,0 +1,151 @@
+# agents/context_packer.py
+# keeps prompts inside a token budget: estimate, share the budget between sections, truncate / drop the tail
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# CJK characters are ~1 token each, everything else ~4 characters per token (llama-style BPE, rough on purpose)
+_CJK = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+TRUNCATED = " …[truncated]"
+MIN_ITEM_TOKENS = 16  # a ranked item cut shorter than this is dropped instead
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """longest prefix (cut at a word boundary when possible) that fits max_tokens, marked as truncated"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    room = max_tokens - estimate_tokens(TRUNCATED)
+    if room <= 0:
+        return ""
+    lo, hi = 0, len(text)
+    while lo < hi: # binary search on the character count
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= room:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    if space > lo * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + TRUNCATED
+
+@dataclass
+class Section:
+    """
+    text: one block, truncated at the end if it gets less than it needs.
+    items: ranked entries (best first); the lowest-ranked are dropped first. labels name them in the report.
+    required: always included in full (system prompt, the user's instruction).
+    """
+    name: str
+    text: str = ""
+    items: Optional[List[str]] = None
+    labels: Optional[List[str]] = None
+    weight: float = 1.0
+    required: bool = False
+    item_max_tokens: Optional[int] = None
+
+    def demand(self) -> int:
+        if self.items is None:
+            return estimate_tokens(self.text)
+        cap = self.item_max_tokens
+        return sum(min(estimate_tokens(i), cap) if cap else estimate_tokens(i) for i in self.items) + len(self.items)
+
+@dataclass
+class PackReport:
+    budget: int
+    used: int = 0
+    sections: Dict[str, int] = field(default_factory=dict)  # tokens per section after packing
+    truncated: List[str] = field(default_factory=list)  # section names, "section:label" for single items
+    dropped: Dict[str, List[str]] = field(default_factory=dict)  # section -> labels of dropped items
+    over_budget: bool = False  # required sections alone exceed the budget
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.truncated or self.dropped)
+
+    def as_dict(self) -> dict:
+        return {"budget": self.budget, "used": self.used, "sections": self.sections, "truncated": self.truncated,
+                "dropped": self.dropped, "over_budget": self.over_budget}
+
+@dataclass
+class Packed:
+    texts: Dict[str, str]
+    items: Dict[str, List[str]]
+    report: PackReport
+
+class ContextPacker:
+    def __init__(self, budget_tokens: int):
+        self.budget = budget_tokens
+
+    def _allocate(self, flexible: List[Section], remaining: int) -> Dict[str, int]:
+        # water filling: sections that need less than their weighted share get exactly that,
+        # what they leave over is shared again among the others
+        alloc: Dict[str, int] = {}
+        todo = {s.name: s for s in flexible}
+        demand = {s.name: s.demand() for s in flexible}
+        while todo:
+            total_w = sum(s.weight for s in todo.values()) or 1.0
+            share = {n: remaining * s.weight / total_w for n, s in todo.items()}
+            fits = [n for n in todo if demand[n] <= share[n]]
+            if not fits:
+                for n in todo:
+                    alloc[n] = int(share[n])
+                break
+            for n in fits:
+                alloc[n] = demand[n]
+                remaining -= demand[n]
+                del todo[n]
+        return alloc
+
+    def pack(self, sections: List[Section]) -> Packed:
+        report = PackReport(budget=self.budget)
+        texts: Dict[str, str] = {}
+        items: Dict[str, List[str]] = {}
+
+        required = [s for s in sections if s.required]
+        for s in required:
+            texts[s.name] = s.text
+            report.sections[s.name] = estimate_tokens(s.text)
+        remaining = self.budget - sum(report.sections.values())
+        if remaining < 0:
+            report.over_budget = True
+            remaining = 0
+
+        flexible = [s for s in sections if not s.required]
+        alloc = self._allocate(flexible, remaining)
+        for s in flexible:
+            room = alloc.get(s.name, 0)
+            if s.items is None:
+                out = truncate_to_tokens(s.text, room)
+                if out != s.text:
+                    report.truncated.append(s.name)
+                texts[s.name] = out
+                report.sections[s.name] = estimate_tokens(out)
+                continue
+
+            kept: List[str] = []
+            used = 0
+            labels = s.labels or [str(i) for i in range(1, len(s.items) + 1)]
+            for idx, (item, label) in enumerate(zip(s.items, labels)):
+                cap = min(s.item_max_tokens or room, room - used - 1)
+                if cap < MIN_ITEM_TOKENS and estimate_tokens(item) > cap:
+                    # out of room: this and every lower-ranked item go
+                    report.dropped[s.name] = labels[idx:]
+                    break
+                out = truncate_to_tokens(item, cap)
+                if out != item:
+                    report.truncated.append(f"{s.name}:{label}")
+                kept.append(out)
+                used += estimate_tokens(out) + 1 # + newline
+            items[s.name] = kept
+            texts[s.name] = "\n".join(kept)
+            report.sections[s.name] = used
+        report.used = sum(report.sections.values())
+        return Packed(texts=texts, items=items, report=report)
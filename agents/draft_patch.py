@@ -0,0 +1,117 @@
+# agents/draft_patch.py
+# small edits as JSON operations applied locally, so the model only generates what changes
+from __future__ import annotations
+import json
+import re
+from typing import Dict, List
+
+PATCH_SCHEMA = (
+    '{"ops": [\n'
+    '  {"op": "replace", "find": "<exact text from the draft>", "text": "<new text>"},\n'
+    '  {"op": "delete", "find": "<exact text>"},\n'
+    '  {"op": "insert", "after": "<exact text>", "text": "<new text>"},\n'
+    '  {"op": "insert", "before": "<exact text>", "text": "<new text>"}\n'
+    ']}\n'
+    'Instead of "find"/"after"/"before" an op may use "paragraph": <number> to target a whole numbered paragraph.'
+)
+
+class PatchError(ValueError):
+    """the model's answer is not a patch that applies cleanly to the draft"""
+
+def number_paragraphs(body: str) -> str:
+    return "\n\n".join(f"[{i}] {p}" for i, p in enumerate(split_paragraphs(body), 1))
+
+def split_paragraphs(body: str) -> List[str]:
+    return [p for p in re.split(r"\n\s*\n", body.strip()) if p.strip()]
+
+def parse_ops(text: str) -> List[Dict]:
+    m = re.search(r"[\[{].*[\]}]", text or "", flags=re.DOTALL)
+    if not m:
+        raise PatchError("no JSON in the answer")
+    try:
+        data = json.loads(m.group(0))
+    except json.JSONDecodeError as e:
+        raise PatchError(f"invalid JSON: {e}") from e
+    ops = data.get("ops") if isinstance(data, dict) else data
+    if not isinstance(ops, list) or not all(isinstance(o, dict) for o in ops):
+        raise PatchError("expected {\"ops\": [...]}")
+    return ops
+
+def _locate(body: str, anchor: str) -> tuple[int, int]:
+    # exactly one occurrence; if the model changed the whitespace, match it loosely
+    if not anchor:
+        raise PatchError("empty anchor")
+    i = body.find(anchor)
+    if i >= 0:
+        if body.find(anchor, i + 1) >= 0:
+            raise PatchError(f"ambiguous anchor: {anchor[:40]!r}")
+        return i, i + len(anchor)
+    loose = r"\s+".join(re.escape(w) for w in anchor.split())
+    found = list(re.finditer(loose, body))
+    if len(found) != 1:
+        raise PatchError(f"anchor not found: {anchor[:40]!r}" if not found else f"ambiguous anchor: {anchor[:40]!r}")
+    return found[0].span()
+
+def _str(op: Dict, key: str) -> str:
+    # null / numbers / objects must not end up in the draft as "None" or a repr
+    value = op.get(key, "")
+    if not isinstance(value, str):
+        raise PatchError(f"{key!r} must be a string")
+    return value
+
+def _apply_paragraph(paras: List[str], op: Dict) -> None:
+    try:
+        i = int(op["paragraph"]) - 1
+    except (TypeError, ValueError) as e:
+        raise PatchError("bad paragraph number") from e
+    if not 0 <= i < len(paras):
+        raise PatchError(f"no paragraph {i + 1}")
+    kind = op.get("op")
+    if kind == "replace":
+        paras[i] = _str(op, "text").strip()
+    elif kind == "delete":
+        paras[i] = ""
+    elif kind == "insert":
+        text = _str(op, "text").strip()
+        # paragraph inserts go after the paragraph unless "before" is set
+        paras[i] = f"{text}\n\n{paras[i]}" if op.get("before") else f"{paras[i]}\n\n{text}"
+    else:
+        raise PatchError(f"unknown op {kind!r}")
+
+def apply_ops(body: str, ops: List[Dict]) -> str:
+    """apply the ops in order; any op that does not apply raises PatchError and nothing is changed"""
+    if not ops:
+        raise PatchError("empty patch")
+    # paragraph numbers refer to the draft as shown to the model, so those ops run first on the original split
+    para_ops = [o for o in ops if "paragraph" in o]
+    text_ops = [o for o in ops if "paragraph" not in o]
+    if para_ops:
+        paras = split_paragraphs(body)
+        for op in para_ops:
+            _apply_paragraph(paras, op)
+        body = "\n\n".join(p for p in paras if p.strip())
+
+    for op in text_ops:
+        kind = op.get("op")
+        if kind == "replace":
+            s, e = _locate(body, _str(op, "find"))
+            body = body[:s] + _str(op, "text") + body[e:]
+        elif kind == "delete":
+            s, e = _locate(body, _str(op, "find"))
+            body = body[:s] + body[e:]
+        elif kind == "insert":
+            text = _str(op, "text")
+            if op.get("after"):
+                _, e = _locate(body, _str(op, "after"))
+                body = body[:e] + text + body[e:]
+            elif op.get("before"):
+                s, _ = _locate(body, _str(op, "before"))
+                body = body[:s] + text + body[s:]
+            else:
+                raise PatchError("insert needs after/before")
+        else:
+            raise PatchError(f"unknown op {kind!r}")
+    body = re.sub(r"\n{3,}", "\n\n", body).strip()
+    if not body:
+        raise PatchError("patch deleted the whole draft")
+    return body
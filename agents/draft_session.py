@@ -0,0 +1,81 @@
+# agents/draft_session.py
+# one running conversation per draft, so every revision re-uses the prompt prefix ollama already evaluated
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from server.llm.base import Message
+
+# identical for every draft (no per-draft text in it), so it is the most re-used part of the prompt
+REVISION_SYSTEM = (
+    "You are an email writing assistant working on one email draft with the user.\n"
+    "Every reply is the complete current email body and nothing else: no To/Subject, no commentary.\n"
+    "Keep names, dates and facts consistent; do not invent facts, write [NEEDS USER INPUT: ...] instead.\n"
+    "Keep a complete email (greeting, body, closing) and end with the user's signature exactly as given."
+)
+
+@dataclass
+class DraftRevisionSession:
+    """
+    messages only ever grow at the end: [system, draft request, assistant body, instruction, assistant body, ...]
+    so ollama's KV cache for the previous turn is a prefix of the next prompt and only the new
+    instruction has to be evaluated (as long as the model stays loaded, see llm.keep_alive).
+    """
+    messages: List[Message] = field(default_factory=list)
+    turns: int = 0
+
+    @classmethod
+    def start(cls, to: str, subject: str, body: str, signature: str) -> "DraftRevisionSession":
+        return cls(messages=[
+            {"role": "system", "content": REVISION_SYSTEM},
+            {"role": "user", "content": f"Signature:\n{signature}\nTo: {to}\nSubject: {subject}\nWrite the email."},
+            {"role": "assistant", "content": body},
+        ])
+
+    @classmethod
+    def from_messages(cls, messages: List[Message], body: str) -> "DraftRevisionSession":
+        # continue the conversation that produced the draft: that prompt is already in the KV cache
+        return cls(messages=[*messages, {"role": "assistant", "content": body}])
+
+    @property
+    def body(self) -> str:
+        return self.messages[-1]["content"] if self.messages and self.messages[-1]["role"] == "assistant" else ""
+
+    def ask(self, instruction: str, current_body: str) -> List[Message]:
+        """messages for the next turn (the session itself is only extended by commit())"""
+        if current_body.strip() != self.body.strip():
+            # the draft changed outside this conversation (manual edit, patch): show the model the real text
+            instruction = f"The draft was changed since your last version, this is the current text:\n{current_body}\n\n{instruction}"
+        return [*self.messages, {"role": "user", "content": instruction}]
+
+    def commit(self, prompt: List[Message], reply: str) -> None:
+        self.messages = [*prompt, {"role": "assistant", "content": reply}]
+        self.turns += 1
+
+class RevisionSessions:
+    """the last few drafts' sessions (LRU); a draft whose session was dropped just starts a new one"""
+    def __init__(self, max_drafts: int = 8, max_turns: int = 8):
+        self.max_drafts = max_drafts
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, DraftRevisionSession]" = OrderedDict()
+
+    def get(self, draft_id: str) -> Optional[DraftRevisionSession]:
+        s = self._sessions.get(draft_id)
+        if s is None:
+            return None
+        if s.turns >= self.max_turns:
+            # history too long: the caller restarts from the current body (one full prompt evaluation)
+            del self._sessions[draft_id]
+            return None
+        self._sessions.move_to_end(draft_id)
+        return s
+
+    def put(self, draft_id: str, session: DraftRevisionSession) -> None:
+        self._sessions[draft_id] = session
+        self._sessions.move_to_end(draft_id)
+        while len(self._sessions) > self.max_drafts:
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -1,10 +1,27 @@
 from __future__ import annotations
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple
-from server.llm.base import LLMProvider, Message
+from server.llm.base import LLMProvider, Message, TokenCallback, stream_chat
+from server.tracing import current_span, traced
+from server.llm.routing import DRAFT, EDIT, EXTRACT, SUMMARIZE, llm_task
+from server.llm.json_output import JsonOutputError, chat_json
 from .base import AgentResult
 from tools.email.base import EmailProvider, EmailHeader
+from .summary_cache import MessageSummaryCache
+from .ranking import EmailRanker
+from .draft_session import DraftRevisionSession, RevisionSessions
+from .draft_patch import PATCH_SCHEMA, PatchError, apply_ops, number_paragraphs, parse_ops
+from .context_packer import ContextPacker, Packed, Section
 import json
 import re
+# ollama `format`: decoding is constrained to this, so the answer always parses
+DRAFT_SCHEMA = {
+    "type": "object",
+    "properties": {"to": {"type": "string"}, "subject": {"type": "string"}, "body": {"type": "string"}},
+    "required": ["to", "subject", "body"],
+}
+
 def _extract_email_local(text: str) -> str:
         m = re.search(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", text, flags=re.IGNORECASE)
         return m.group(0) if m else ""
@@ -12,57 +29,213 @@ def _extract_email_local(text: str) -> str:
 class EmailAgent:
     name = "email"
 
-    def __init__(self, provider: LLMProvider, email_provider: EmailProvider, profile: dict):
+    def __init__(self, provider: LLMProvider, email_provider: EmailProvider, profile: dict,
+                 summary_mode: str = "single", summary_cache: MessageSummaryCache | None = None,
+                 map_workers: int = 2, map_max_messages: int = 200,
+                 revision_mode: str = "oneshot", revision_max_turns: int = 8, edit_mode: str = "full",
+                 context_budget: int = 6000, full_bodies: int = 0, body_max_chars: int = 4000):
         self.llm = provider
         self.mail = email_provider
         self.profile = profile
+        # "single": top 5 headers in one prompt; "map_reduce": one cached summary per message, then one combine step
+        self.summary_mode = summary_mode
+        self.summary_cache = summary_cache
+        self.map_workers = map_workers
+        self.map_max_messages = map_max_messages
+        # "oneshot": every revision is a fresh prompt; "session": one growing conversation per draft (KV-cache reuse)
+        self.revisions = RevisionSessions(max_turns=revision_max_turns) if revision_mode == "session" else None
+        # "patch": `revise edit` asks for JSON edit ops and applies them locally; "full": the model rewrites the body
+        self.edit_mode = edit_mode
+        # prompt tokens per call (num_ctx minus room for the answer); sections are truncated / dropped to fit
+        self.packer = ContextPacker(context_budget)
+        # summaries read the full body (at most body_max_chars) of the top full_bodies messages instead of the snippet
+        self.full_bodies = full_bodies
+        self.body_max_chars = body_max_chars
+
+    def _pack(self, sections: List[Section]) -> Packed:
+        packed = self.packer.pack(sections)
+        if packed.report.changed or packed.report.over_budget:
+            current_span().set(context=packed.report.as_dict())
+        return packed
+
+    @staticmethod
+    def _dropped_note(packed: Packed, on_token: TokenCallback | None) -> str:
+        # tell the user which emails did not fit into the prompt
+        dropped = packed.report.dropped.get("emails", [])
+        if not dropped:
+            return ""
+        note = f"\n\n（上下文长度有限，省略了 {len(dropped)} 封排名较低的邮件）"
+        if on_token is not None:
+            on_token(note)
+        return note
     
-    def summarize_inbox(self, days: int = 7 , limit: int = 10) -> AgentResult:
+    def _bodies(self, emails: list[EmailHeader]) -> Dict[str, str]:
+        # only providers that can fetch bodies (gmail); they cache them, so each body is downloaded once
+        fetch = getattr(self.mail, "fetch_bodies", None) if emails else None
+        if fetch is None:
+            return {}
+        try:
+            bodies = fetch([e.id for e in emails], max_chars=self.body_max_chars)
+        except Exception as e:
+            current_span().set(bodies_error=f"{type(e).__name__}: {e}") # snippets are still there
+            return {}
+        current_span().set(full_bodies=len(bodies))
+        return bodies
+
+    @property
+    def inbox_limit(self) -> int:
+        # how many messages a summary looks at
+        return self.map_max_messages if self.summary_mode == "map_reduce" else 5
+
+    @traced("email_agent.summarize_inbox")
+    def summarize_inbox(self, days: int = 7 , limit: int = 10, on_token: TokenCallback | None = None) -> AgentResult:
         emails = self.mail.list_latest(limit=limit, days = days)
-        emails = self.rank_emails(emails)
-        emails = emails [:5]
+        return self.summarize_emails(emails, on_token=on_token)
+
+    @traced("email_agent.summarize_emails")
+    @llm_task(SUMMARIZE)
+    def summarize_emails(self, emails: list[EmailHeader], on_token: TokenCallback | None = None) -> AgentResult:
+        # the LLM half of summarize_inbox, for callers that already hold the listing (e.g. the prefetcher)
+        if self.summary_mode == "map_reduce":
+            return self.summarize_map_reduce(emails, on_token=on_token)
+        emails = self.rank_emails(emails, k=5)
+        bodies = self._bodies(emails[:self.full_bodies])
         lines = []
         for i, e in enumerate(emails, start=1):
+            text = bodies.get(e.id)
             lines.append(
                 f"{i}. From: {e.from_}\n"
                 f"   Date: {e.date}\n"
                 f"   Subject: {e.subject}\n"
-                f"   Snippet: {e.snippet}\n"
+                + (f"   Body:\n{text}\n" if text else f"   Snippet: {e.snippet}\n")
             )
-        inbox_text = "\n".join(lines) if lines else "no email received"
+        system = (
+            "你是一个邮件助理。请用中文完成：\n"
+            "1) 总结最近邮件要点, 邮件内的重要的信息（时间，任务，紧急程度）；\n"
+            "2) 标出最重要的 1-3 封（说明理由）；\n"
+            "3) 给出可执行下一步（要不要回、回什么）。\n"
+            "输出用条目列表，简洁清晰。"
+        )
+        packed = self._pack([
+            Section("system", system, required=True),
+            # full bodies are already capped at body_max_chars; only the budget limits them here
+            Section("emails", items=lines, labels=[e.subject for e in emails], item_max_tokens=None if bodies else 300),
+        ])
+        inbox_text = "\n".join(packed.items["emails"]) if packed.items["emails"] else "no email received"
 
         messages: List[Message] = [
-            {"role": "system", "content": (
-                "你是一个邮件助理。请用中文完成：\n"
-                "1) 总结最近邮件要点, 邮件内的重要的信息（时间，任务，紧急程度）；\n"
-                "2) 标出最重要的 1-3 封（说明理由）；\n"
-                "3) 给出可执行下一步（要不要回、回什么）。\n"
-                "输出用条目列表，简洁清晰。"
-            )},
+            {"role": "system", "content": system},
             {"role": "user", "content": f"这是我最近的邮件列表：\n\n{inbox_text}"},
         ]
-        resp = self.llm.chat(messages)
-        return AgentResult(content=resp.content, messages=messages)
+        context = packed.report.as_dict() if packed.report.changed else None
+        if on_token is not None:
+            resp = stream_chat(self.llm, messages, on_token, temperature=0.0)
+            note = self._dropped_note(packed, on_token)
+            return AgentResult(content=resp.content + note, messages=messages, ttft_s=resp.raw.get("ttft_s"), context=context)
+        # temperature 0: same inbox -> same summary, so repeats can be served from the response cache
+        resp = self.llm.chat(messages, temperature=0.0)
+        return AgentResult(content=resp.content + self._dropped_note(packed, None), messages=messages, context=context)
     
     
 
+    @traced("email_agent.summarize_message")
+    @llm_task(EXTRACT)
+    def summarize_message(self, e: EmailHeader, body: str | None = None) -> str:
+        """map step: one short line for one email (from its full body when given)"""
+        messages: List[Message] = [
+            {"role": "system", "content": (
+                "Summarize this email in ONE short line (max 30 words), in Chinese.\n"
+                "Include: what it is about, any deadline/time, any action needed. No preamble."
+            )},
+            {"role": "user", "content": (
+                f"From: {e.from_}\n"
+                f"Date: {e.date}\n"
+                f"Subject: {e.subject}\n"
+                + (f"Body:\n{body}" if body else f"Snippet: {e.snippet}")
+            )},
+        ]
+        resp = self.llm.chat(messages, temperature=0.0, max_tokens=80)
+        return " ".join((resp.content or "").split())
+
+    @traced("email_agent.summarize_map_reduce")
+    @llm_task(SUMMARIZE)
+    def summarize_map_reduce(self, emails: list[EmailHeader], on_token: TokenCallback | None = None) -> AgentResult:
+        emails = self.rank_emails(emails, k=self.map_max_messages)
+        if self.summary_cache is None:
+            self.summary_cache = MessageSummaryCache(None) # in-memory: still saves work within this process
+        cache = self.summary_cache
+        known = cache.get_many(e.id for e in emails)
+
+        # map: only messages never seen before cost an LLM call
+        todo = [e for e in emails if e.id not in known]
+        if todo:
+            # full bodies only for top-ranked messages that still need a summary
+            bodies = self._bodies([e for e in emails[:self.full_bodies] if e.id not in known])
+            # each job runs in a copy of the caller's context: LLM priority and trace parent carry over
+            ctxs = [contextvars.copy_context() for _ in todo]
+            with ThreadPoolExecutor(max_workers=max(1, self.map_workers)) as pool:
+                fresh = dict(zip((e.id for e in todo), pool.map(
+                    lambda c, e: c.run(self.summarize_message, e, bodies.get(e.id)), ctxs, todo)))
+            cache.put_many(fresh)
+            known.update(fresh)
+
+        # reduce: combine the one-line summaries (already in rank order)
+        lines = [
+            f"{i}. [{e.date}] {e.from_} | {e.subject}\n   {known.get(e.id, '')}"
+            for i, e in enumerate(emails, start=1)
+        ]
+        system = (
+            "你是一个邮件助理。下面是每封邮件的一句话摘要（已按重要性排序）。请用中文完成：\n"
+            "1) 总结最近邮件要点, 邮件内的重要的信息（时间，任务，紧急程度）；\n"
+            "2) 标出最重要的 1-3 封（说明理由）；\n"
+            "3) 给出可执行下一步（要不要回、回什么）。\n"
+            "输出用条目列表，简洁清晰。"
+        )
+        # lines are in rank order, so the least important summaries are the ones dropped
+        packed = self._pack([
+            Section("system", system, required=True),
+            Section("emails", items=lines, labels=[e.subject for e in emails], item_max_tokens=120),
+        ])
+        kept = packed.items["emails"]
+        inbox_text = "\n".join(kept) if kept else "no email received"
+        messages: List[Message] = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": f"这是我最近的邮件摘要（共 {len(kept)} 封）：\n\n{inbox_text}"},
+        ]
+        context = packed.report.as_dict() if packed.report.changed else None
+        if on_token is not None:
+            resp = stream_chat(self.llm, messages, on_token, temperature=0.0)
+            note = self._dropped_note(packed, on_token)
+            return AgentResult(content=resp.content + note, messages=messages, ttft_s=resp.raw.get("ttft_s"), context=context)
+        resp = self.llm.chat(messages, temperature=0.0)
+        return AgentResult(content=resp.content + self._dropped_note(packed, None), messages=messages, context=context)
+
+    @traced("email_agent.draft_email")
+    @llm_task(DRAFT)
     def draft_email(self, to: str, subject: str, intent: str, context: str = "") -> Tuple[AgentResult, str]:
         name = self.profile.get("display_name", "Jason")
         sig = self.profile.get("email_signature", f"Best regards,\n{name}")
         default_lang = (self.profile.get("default_email_language") or "en").lower()
-       
+        system = (
+            "You are a professional email writing assistant.\n"
+            "Write a concise, polite email body.\n"
+            "Rules:\n"
+            "- Do NOT invent facts; if missing info, write [NEEDS USER INPUT: ...]\n"
+            f"- Default language: {default_lang} (use English unless user explicitly wants Chinese)\n"
+            f"- Sender name is {name}\n"
+            "- The email must end with the signature EXACTLY as provided below:\n"
+            f"{sig}\n"
+            "- Output ONLY the email body (no To/Subject)."
+        )
+        packed = self._pack([
+            Section("system", system, required=True),
+            Section("intent", intent, weight=2),
+            Section("context", context),
+        ])
+        intent, context = packed.texts["intent"], packed.texts["context"]
+
         messages: List[Message] = [
-            {"role": "system", "content": (
-                "You are a professional email writing assistant.\n"
-                "Write a concise, polite email body.\n"
-                "Rules:\n"
-                "- Do NOT invent facts; if missing info, write [NEEDS USER INPUT: ...]\n"
-                f"- Default language: {default_lang} (use English unless user explicitly wants Chinese)\n"
-                f"- Sender name is {name}\n"
-                "- The email must end with the signature EXACTLY as provided below:\n"
-                f"{sig}\n"
-                "- Output ONLY the email body (no To/Subject)."
-            )},
+            {"role": "system", "content": system},
             {"role": "user", "content": (
                 f"To: {to}\n"
                 f"Subject: {subject}\n"
@@ -74,39 +247,50 @@ class EmailAgent:
         resp = self.llm.chat(messages)
 
         draft_id = self.mail.create_draft(to=to, subject=subject, body=resp.content)
+        if self.revisions is not None and draft_id:
+            self.revisions.put(draft_id, DraftRevisionSession.from_messages(messages, resp.content))
 
         # 注意：这里只创建草稿，不发送
         return AgentResult(
             content=resp.content,
             messages=messages,
         ), draft_id
-    def rank_emails (self, emails:list[EmailHeader])->list[EmailHeader]:
+    @traced("email_agent.rank_emails")
+    def rank_emails (self, emails:list[EmailHeader], k: int | None = None)->list[EmailHeader]:
         """
         先做一个简单规则版，后续接 memory：
         - memory 里可存：重要联系人/关键词/课程名/教授邮箱等
+        k: only keep the k best (heap selection instead of a full sort)
         """
-        important_senders = set(self.profile.get("important_senders", []))  
-        important_keywords = set(self.profile.get("important_keywords", []))
-
-        def score(e: EmailHeader) -> int:
-            s = 0
-            if any(x in (e.from_ or "") for x in important_senders):
-                s += 5
-            subj = (e.subject or "").lower()
-            if any(k.lower() in subj for k in important_keywords):
-                s += 3
-           
-            for kw in ["urgent", "asap", "deadline", "due", "quiz", "midterm", "final"]:
-                if kw in subj:
-                    s += 2
-            return s
-
-        return sorted(emails, key=score, reverse=True)
+        return self._get_ranker().top_k(emails, k)
+
+    def _get_ranker(self) -> EmailRanker:
+        # compiled once; rebuilt only if the profile lists change
+        key = (tuple(self.profile.get("important_senders", [])), tuple(self.profile.get("important_keywords", [])))
+        if getattr(self, "_ranker_key", None) != key:
+            self._ranker = EmailRanker(*key)
+            self._ranker_key = key
+        return self._ranker
     # agents/email_agent.py  (add these methods inside EmailAgent)
 
-    def edit_draft_body(self, current_body: str, instruction: str, to: str | None = None, subject: str | None = None) -> str:
+    @traced("email_agent.edit_draft_body")
+    @llm_task(EDIT)
+    def edit_draft_body(self, current_body: str, instruction: str, to: str | None = None, subject: str | None = None,
+                        draft_id: str | None = None) -> str:
         name = self.profile.get("display_name", "Jason")
         sig = self.profile.get("email_signature", f"Best regards,\n{name}")
+        if self.edit_mode == "patch":
+            try:
+                body = self.patch_draft_body(current_body, instruction)
+                current_span().set(edit="patch")
+                return body
+            except PatchError as e:
+                current_span().set(edit="full", patch_error=str(e)) # fall back to a full rewrite below
+        if self.revisions is not None and draft_id:
+            return self._revise_in_session(draft_id, current_body, to, subject, sig, (
+                f"Revise the email. Instruction: {instruction}\n"
+                "Preserve meaning unless the instruction asks to change it. Reply with the full revised body only."
+            ))
         prompt = f"""
             You are editing an email draft.
 
@@ -134,9 +318,39 @@ class EmailAgent:
         return resp.content.strip()
 
 
-    def regenerate_body(self, instruction: str, to: str | None = None, subject: str | None = None, reference_body: str | None = None) -> str:
+    @traced("email_agent.patch_draft_body")
+    @llm_task(EDIT)
+    def patch_draft_body(self, current_body: str, instruction: str) -> str:
+        """edit ops from the model, applied here; raises PatchError if they don't apply"""
+        messages: List[Message] = [
+            {"role": "system", "content": (
+                "You edit email drafts by returning edit operations, never the whole email.\n"
+                "Return STRICT JSON only (no markdown, no commentary):\n"
+                f"{PATCH_SCHEMA}\n"
+                "Quote anchor text exactly as it appears in the draft (without the [n] numbers) and keep it short but unique.\n"
+                "Keep names, dates and facts consistent; do not touch the signature unless asked."
+            )},
+            {"role": "user", "content": f"Draft (paragraphs numbered):\n{number_paragraphs(current_body)}\n\nInstruction:\n{instruction}"},
+        ]
+        resp = self.llm.chat(messages, temperature=0.0)
+        return apply_ops(current_body, parse_ops(resp.content))
+
+    @traced("email_agent.regenerate_body")
+    @llm_task(DRAFT)
+    def regenerate_body(self, instruction: str, to: str | None = None, subject: str | None = None, reference_body: str | None = None,
+                        draft_id: str | None = None) -> str:
         name = self.profile.get("display_name", "Jason")
         sig = self.profile.get("email_signature", f"Best regards,\n{name}")
+        if self.revisions is not None and draft_id and reference_body:
+            return self._revise_in_session(draft_id, reference_body, to, subject, sig, (
+                f"Rewrite the email from scratch with the same intent. Requirements: {instruction}\n"
+                "Reply with the full new body only."
+            ))
+        # the original is only there for its intent: it is what gets cut when the prompt is too long
+        reference_body = self._pack([
+            Section("instruction", instruction, required=True),
+            Section("reference", reference_body or ""),
+        ]).texts["reference"]
         prompt = f"""
     You are rewriting an email from scratch.
 
@@ -162,29 +376,49 @@ class EmailAgent:
 
         resp = self.llm.chat([{"role": "user", "content": prompt}])
         return resp.content.strip()
+    def _revise_in_session(self, draft_id: str, current_body: str, to: str | None, subject: str | None,
+                           sig: str, instruction: str) -> str:
+        # follow-up turn in the draft's conversation: only `instruction` is new to the model
+        session = self.revisions.get(draft_id) or DraftRevisionSession.start(to or "", subject or "", current_body, sig)
+        prompt = session.ask(instruction, current_body)
+        resp = self.llm.chat(prompt)
+        body = resp.content.strip()
+        session.commit(prompt, body)
+        self.revisions.put(draft_id, session)
+        return body
+
+    @traced("email_agent.draft_email_auto")
+    @llm_task(EXTRACT)
     def draft_email_auto(self, user_text: str, context: str = "") -> Tuple[AgentResult, str, str, str]:
   
         name = self.profile.get("display_name", "Jason")
         sig = self.profile.get("email_signature", f"Best regards,\n{name}")
         default_lang = (self.profile.get("default_email_language") or "en").lower()
         to_guess = _extract_email_local(user_text)
+        system = (
+            "You are a professional email assistant.\n"
+            "Return STRICT JSON only (no markdown, no commentary).\n"
+            "Schema:\n"
+            "{\n"
+            '  "to": string,\n'
+            '  "subject": string,\n'
+            '  "body": string\n'
+            "}\n"
+            "Rules:\n"
+            "- Do NOT invent facts.\n"
+            "- If recipient email is missing, set to \"\" and include [NEEDS USER INPUT: recipient email] in body.\n"
+            f"- Default language: {default_lang}\n"
+            "- The email must end with the signature EXACTLY as provided below:\n"
+            f"{sig}\n"
+        )
+        packed = self._pack([
+            Section("system", system, required=True),
+            Section("request", user_text, weight=2),
+            Section("context", context),
+        ])
+        user_text, context = packed.texts["request"], packed.texts["context"]
         messages: List[Message] = [
-            {"role": "system", "content": (
-                "You are a professional email assistant.\n"
-                "Return STRICT JSON only (no markdown, no commentary).\n"
-                "Schema:\n"
-                "{\n"
-                '  "to": string,\n'
-                '  "subject": string,\n'
-                '  "body": string\n'
-                "}\n"
-                "Rules:\n"
-                "- Do NOT invent facts.\n"
-                "- If recipient email is missing, set to \"\" and include [NEEDS USER INPUT: recipient email] in body.\n"
-                f"- Default language: {default_lang}\n"
-                "- The email must end with the signature EXACTLY as provided below:\n"
-                f"{sig}\n"
-            )},
+            {"role": "system", "content": system},
             {"role": "user", "content": (
                 f"User request:\n{user_text}\n\n"
                 f"Context (optional): {context}\n"
@@ -192,24 +426,30 @@ class EmailAgent:
             )},
         ]
 
-        resp = self.llm.chat(messages)
-        raw = (resp.content or "").strip()
-
-        m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
-        json_text = m.group(0) if m else raw
-
         try:
-            data = json.loads(json_text)
-        except Exception:
-            body = raw if raw else "[NEEDS USER INPUT: recipient email]"
-            return AgentResult(content=body, messages=messages), "", "", ""
+            data, resp = chat_json(self.llm, messages, DRAFT_SCHEMA)
+            current_span().set(json="schema", stopped_early=bool((resp.raw or {}).get("stopped_early")))
+        except JsonOutputError as e:
+            # provider without `format` support (or a broken answer): dig the object out of the text, no second call
+            raw = e.text.strip()
+            current_span().set(json="fallback", json_error=str(e))
+            m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
+            json_text = m.group(0) if m else raw
+            try:
+                data = json.loads(json_text)
+            except Exception:
+                data = None
+            if not isinstance(data, dict):
+                # bare text, or JSON that is not an object (list, string...): no draft
+                body = raw if raw else "[NEEDS USER INPUT: recipient email]"
+                return AgentResult(content=body, messages=messages), "", "", ""
 
-        to = (data.get("to") or "").strip()
+        to = str(data.get("to") or "").strip()
 
         if not to and to_guess:
             to= to_guess
-        subject = (data.get("subject") or "").strip()
-        body = (data.get("body") or "").strip()
+        subject = str(data.get("subject") or "").strip()
+        body = str(data.get("body") or "").strip()
 
         if not to:
             if "[NEEDS USER INPUT" not in body:
@@ -218,4 +458,7 @@ class EmailAgent:
         if to and "[NEEDS USER INPUT: recipient email]" in body:
             body = body.replace("[NEEDS USER INPUT: recipient email]", "").strip()
         draft_id = self.mail.create_draft(to=to, subject=subject or "(no subject)", body=body)
+        if self.revisions is not None and draft_id:
+            # the JSON exchange is no prefix for plain-text revisions: start the draft's session from the body
+            self.revisions.put(draft_id, DraftRevisionSession.start(to, subject, body, sig))
         return AgentResult(content=body, messages=messages), draft_id, to, subject
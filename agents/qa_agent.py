@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import List, Dict 
-from server.llm.base import LLMProvider, Message
+from server.llm.base import LLMProvider, Message, TokenCallback, stream_chat
+from server.tracing import traced
+from server.llm.routing import QA, llm_task
 from .base import AgentResult
 
 class QAAgent:
@@ -9,10 +11,15 @@ class QAAgent:
     def __init__(self,provider: LLMProvider):
         self.provider = provider 
 
-    def handle(self, user_text: str) -> AgentResult:
+    @traced("qa_agent.handle")
+    @llm_task(QA)
+    def handle(self, user_text: str, on_token: TokenCallback | None = None) -> AgentResult:
         messages: List [Message] = [
             {'role':'system','content':'you are an local Ai assistant, give users response in the same language as their input.'},
             {'role':'user','content': user_text},
         ]
+        if on_token is not None:
+            resp = stream_chat(self.provider, messages, on_token)
+            return AgentResult(content = resp.content, messages = messages, ttft_s = resp.raw.get("ttft_s"))
         resp = self.provider.chat(messages)
         return AgentResult(content = resp.content, messages = messages)
\ No newline at end of file
@@ -0,0 +1,103 @@
+# agents/ranking.py
+# compiled email ranking: the profile's senders / keywords are turned into one matcher, built once per profile
+from __future__ import annotations
+import heapq
+from bisect import bisect_right
+from itertools import accumulate
+from operator import add
+from typing import Dict, Iterable, List, Optional, Set
+
+from tools.email.base import EmailHeader
+
+URGENT_KEYWORDS = ("urgent", "asap", "deadline", "due", "quiz", "midterm", "final")
+SENDER_SCORE = 5
+KEYWORD_SCORE = 3
+URGENT_SCORE = 2 # per distinct urgent word in the subject
+
+_SEP = "\x00" # headers never contain NUL, so no pattern can match across two emails
+
+class _BatchMatcher:
+    """
+    Finds which patterns occur in which text of a batch. The texts are joined into one string and every
+    pattern is searched with str.find over that string (C speed, ~1 call per pattern + 1 per hit); hits are
+    mapped back to their text with a bisect. In CPython this beats one big regex alternation, which pays
+    per character for every alternative.
+    """
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = sorted({p for p in patterns if p and _SEP not in p})
+
+    def scan(self, texts: List[str]) -> Dict[int, Set[str]]:
+        hits: Dict[int, Set[str]] = {}
+        if not self.patterns or not texts:
+            return hits
+        joined = _SEP.join(texts)
+        # starts[i] = offset of texts[i] in joined (+1 per separator); starts[-1] = end
+        starts = list(map(add, [0, *accumulate(map(len, texts))], range(len(texts) + 1)))
+        end = len(joined)
+        find = joined.find
+        for p in self.patterns:
+            pos = find(p)
+            while pos != -1:
+                i = bisect_right(starts, pos) - 1
+                hits.setdefault(i, set()).add(p)
+                nxt = starts[i + 1] if i + 1 < len(starts) else end
+                pos = find(p, nxt) # one hit per text is enough, jump to the next one
+        return hits
+
+class EmailRanker:
+    """
+    Same scores and order as the original rank_emails:
+    +5 if From contains an important sender (case-sensitive), +3 if the subject contains an important keyword,
+    +2 per urgent word in the subject (both case-insensitive). Ties keep the input order.
+    """
+    def __init__(self, important_senders: Iterable[str], important_keywords: Iterable[str],
+                 urgent_keywords: Iterable[str] = URGENT_KEYWORDS):
+        senders = set(important_senders)
+        self._keywords = {k.lower() for k in important_keywords}
+        self._urgent = set(urgent_keywords)
+
+        # "" is a substring of everything
+        self._sender_always = "" in senders
+        self._keyword_always = "" in self._keywords
+        self._urgent_always = 1 if "" in self._urgent else 0
+
+        self._senders = _BatchMatcher(senders)
+        self._subjects = _BatchMatcher(self._keywords | self._urgent)
+
+    def score(self, e: EmailHeader) -> int:
+        return self.score_many([e])[0]
+
+    def score_many(self, emails: List[EmailHeader]) -> List[int]:
+        n = len(emails)
+        base = (SENDER_SCORE if self._sender_always else 0) + (KEYWORD_SCORE if self._keyword_always else 0) \
+            + URGENT_SCORE * self._urgent_always
+        scores = [base] * n
+        if n == 0:
+            return scores
+
+        if not self._sender_always:
+            for i in self._senders.scan([e.from_ or "" for e in emails]):
+                scores[i] += SENDER_SCORE
+
+        keywords, urgent = self._keywords, self._urgent
+        for i, found in self._subjects.scan([(e.subject or "").lower() for e in emails]).items():
+            if not self._keyword_always and not keywords.isdisjoint(found):
+                scores[i] += KEYWORD_SCORE
+            scores[i] += URGENT_SCORE * len(urgent.intersection(found))
+        return scores
+
+    def top_k(self, emails: List[EmailHeader], k: Optional[int] = None) -> List[EmailHeader]:
+        scores = self.score_many(emails)
+        n = len(emails)
+        if k is None or k >= n:
+            idx = sorted(range(n), key=scores.__getitem__, reverse=True) # stable: ties keep input order
+            return [emails[i] for i in idx]
+        if k <= 0:
+            return []
+        # most mail has the minimum score: heap-select among the others, then fill up in input order
+        low = min(scores)
+        above = [i for i in range(n) if scores[i] != low]
+        best = heapq.nsmallest(k, above, key=lambda i: (-scores[i], i)) # O(m log k)
+        if len(best) < k:
+            best += [i for i in range(n) if scores[i] == low][:k - len(best)]
+        return [emails[i] for i in best]
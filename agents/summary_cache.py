@@ -0,0 +1,40 @@
+# agents/summary_cache.py
+# per-message summaries keyed by gmail message id (message content never changes, so neither does its summary)
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+class MessageSummaryCache:
+    def __init__(self, path: Optional[str] = "data/message_summaries.sqlite3"):
+        # path=None keeps the cache in memory only
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS summaries (id TEXT PRIMARY KEY, summary TEXT, created REAL)")
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, str]:
+        ids = list(ids)
+        out: Dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500): # sqlite caps the number of bound parameters
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for msg_id, summary in self._db.execute(f"SELECT id, summary FROM summaries WHERE id IN ({marks})", chunk):
+                    out[msg_id] = summary
+        return out
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO summaries(id, summary, created) VALUES (?,?,?)",
+                [(k, v, now) for k, v in items.items()],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
@@ -0,0 +1,63 @@
+# benchmarks/bench_bodies.py
+# full bodies for the top-ranked messages: gmail calls on first / repeated summaries, cache size on disk,
+# how much more of each email the summary prompt sees than with snippets
+# run: python -m benchmarks.bench_bodies [--top 5] [--body-words 400] [--latency-ms 40]
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from agents.context_packer import estimate_tokens
+from agents.email_agent import EmailAgent
+from server.llm.ollama_provider import OllamaProvider
+from tools.email.body_cache import BodyCache
+from tools.email.gamil_provider import GmailOAuthConfig, GmailProvider
+from .fake_gmail import FakeGmail, build_fake_service
+from .fake_ollama import FakeOllama
+
+MODEL = "llama3.1:8b"
+PROFILE = {"display_name": "Jason", "important_senders": ["sender1@school.edu"], "important_keywords": ["deadline"]}
+
+def prompt_tokens(result) -> int:
+    return sum(estimate_tokens(m["content"]) for m in result.messages)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=5)
+    ap.add_argument("--body-words", type=int, default=400)
+    ap.add_argument("--max-chars", type=int, default=4000)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    args = ap.parse_args()
+
+    gmail = FakeGmail(n_messages=30, latency_s=args.latency_ms / 1000, body_words=args.body_words).start()
+    ollama = FakeOllama(prompt_latency_s=0.01, tokens_per_s=0, reply_tokens=20, models=(MODEL,)).start()
+    llm = OllamaProvider(ollama.base_url, MODEL, time_out_s=10)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bodies.sqlite3"
+        mail = GmailProvider(GmailOAuthConfig("", ""), service=build_fake_service(gmail.base_url), body_cache=BodyCache(str(db)))
+        try:
+            snippets = EmailAgent(llm, mail, PROFILE)
+            bodies = EmailAgent(llm, mail, PROFILE, full_bodies=args.top, body_max_chars=args.max_chars)
+            r = snippets.summarize_inbox(limit=20)
+            print(f"summary prompt with snippets        ~{prompt_tokens(r):5d} tokens")
+
+            for run in ("first", "repeat"):
+                gmail.reset_counters()
+                t0 = time.perf_counter()
+                r = bodies.summarize_inbox(limit=20)
+                ms = (time.perf_counter() - t0) * 1000
+                print(f"summary with top-{args.top} bodies ({run:6s}) ~{prompt_tokens(r):5d} tokens  {ms:6.0f} ms  "
+                      f"gmail http {gmail.calls['http']}, full gets {gmail.calls['messages.get.full']}")
+
+            st = mail.body_cache.stats()
+            print(f"body cache: {st['messages']} messages, {st['chars']} chars of text -> "
+                  f"{st['stored_bytes']} bytes compressed ({st['stored_bytes'] / max(1, st['chars']):.2f}x), "
+                  f"db file {db.stat().st_size // 1024} KiB")
+        finally:
+            llm.close()
+            ollama.stop()
+            gmail.stop()
+
+if __name__ == "__main__":
+    main()
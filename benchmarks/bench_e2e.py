@@ -0,0 +1,169 @@
+# benchmarks/bench_e2e.py
+# end-to-end turns through Orchestrator.handle against local fake ollama + fake gmail servers (no network, no credentials)
+# run: python -m benchmarks.bench_e2e [--iterations 20] [--concurrency 1,4,8] [--llm-latency-ms 50] [--tokens-per-s 200]
+#   scenarios: qa, inbox summary, draft, revise, confirm-send
+#   per scenario: p50 / p95 / p99 turn latency, HTTP calls per turn, then throughput with N concurrent sessions
+from __future__ import annotations
+import argparse
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+from server.llm.ollama_provider import OllamaProvider
+from server.orchestrator import Orchestrator
+from tools.email.draft_sync import DraftSyncQueue
+from tools.email.gamil_provider import GmailOAuthConfig, GmailProvider
+from .fake_gmail import FakeGmail, build_fake_service
+from .fake_ollama import FakeOllama
+
+MODEL = "llama3.1:8b"
+PROFILE = {
+    "important_senders": ["sender3@school.edu"],
+    "important_keywords": ["deadline", "exam"],
+}
+DRAFT = '草拟邮件 to=prof@school.edu subject="Extension" 内容="ask for a two day extension"'
+
+@dataclass
+class Scenario:
+    name: str
+    setup: List[str]  # turns before the measured one (not timed, not counted)
+    turn: str
+    stream: bool = False
+
+SCENARIOS = [
+    Scenario("qa", [], "what is a hash table?", stream=True),
+    Scenario("inbox summary", [], "总结我的收件箱", stream=True),
+    Scenario("draft", [], DRAFT),
+    Scenario("revise", [DRAFT], "revise edit make it shorter and more formal"),
+    Scenario("confirm send", [DRAFT, "revise edit make it shorter"], "CONFIRM SEND"),
+]
+
+def percentile(samples: List[float], q: float) -> float:
+    # nearest rank
+    s = sorted(samples)
+    if not s:
+        return float("nan")
+    k = max(0, min(len(s) - 1, math.ceil(q / 100 * len(s)) - 1))
+    return s[k]
+
+class Harness:
+    def __init__(self, ollama: FakeOllama, gmail: FakeGmail, debounce_s: float):
+        self.ollama = ollama
+        self.gmail = gmail
+        self.llm = OllamaProvider(base_url=ollama.base_url, model=MODEL, time_out_s=30, temperature=0.2,
+                                  pool_connections=16, pool_maxsize=64)
+        self.email = GmailProvider(GmailOAuthConfig("", ""), service=build_fake_service(gmail.base_url))
+        self.draft_sync = DraftSyncQueue(self.email, debounce_s=debounce_s)
+
+    def session(self) -> Orchestrator:
+        # one orchestrator per user, providers and the sync queue shared (like scripts/run_server.py)
+        return Orchestrator(llm_provider=self.llm, email_provider=self.email, profile=PROFILE,
+                            interactive=False, draft_sync=self.draft_sync)
+
+    def run_turn(self, sc: Scenario) -> float:
+        orch = self.session()
+        for text in sc.setup:
+            orch.handle(text)
+        t0 = time.perf_counter()
+        r = orch.handle(sc.turn, on_token=(lambda tok: None) if sc.stream else None)
+        dt = time.perf_counter() - t0
+        assert r.content, f"{sc.name}: empty answer"
+        return dt
+
+    def calls(self) -> Counter:
+        c = Counter({f"ollama.{k}": v for k, v in self.ollama.calls.items()})
+        c.update({f"gmail.{k}": v for k, v in self.gmail.calls.items()})
+        return c
+
+    def reset(self) -> None:
+        self.draft_sync.flush()
+        self.ollama.reset_counters()
+        self.gmail.reset_counters()
+
+def sequential(h: Harness, sc: Scenario, iterations: int) -> tuple[List[float], Counter]:
+    samples: List[float] = []
+    turn_calls: Counter = Counter()
+    for _ in range(iterations):
+        h.reset()
+        orch = h.session()
+        for text in sc.setup:
+            orch.handle(text)
+        h.ollama.reset_counters()
+        h.gmail.reset_counters()
+        t0 = time.perf_counter()
+        r = orch.handle(sc.turn, on_token=(lambda tok: None) if sc.stream else None)
+        samples.append(time.perf_counter() - t0)
+        assert r.content, f"{sc.name}: empty answer"
+        h.draft_sync.flush() # write-behind uploads belong to this turn too
+        turn_calls.update(h.calls())
+    return samples, turn_calls
+
+def concurrent(h: Harness, sc: Scenario, workers: int, iterations: int) -> tuple[float, List[float]]:
+    samples: List[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(iterations):
+            dt = h.run_turn(sc)
+            with lock:
+                samples.append(dt)
+
+    h.reset()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for f in [ex.submit(worker) for _ in range(workers)]:
+            f.result()
+    wall = time.perf_counter() - t0
+    h.draft_sync.flush()
+    return len(samples) / wall, samples
+
+def _ms(x: float) -> str:
+    return f"{x * 1000:8.1f}"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--concurrency", default="1,4,8")
+    ap.add_argument("--llm-latency-ms", type=float, default=50.0, help="fake ollama prompt evaluation time")
+    ap.add_argument("--tokens-per-s", type=float, default=200.0)
+    ap.add_argument("--reply-tokens", type=int, default=40)
+    ap.add_argument("--gmail-latency-ms", type=float, default=20.0, help="per HTTP round trip")
+    ap.add_argument("--messages", type=int, default=50)
+    ap.add_argument("--debounce-ms", type=float, default=200.0, help="draft sync debounce")
+    ap.add_argument("--only", default="", help="comma separated scenario names")
+    args = ap.parse_args()
+
+    ollama = FakeOllama(prompt_latency_s=args.llm_latency_ms / 1000, tokens_per_s=args.tokens_per_s,
+                        reply_tokens=args.reply_tokens, models=(MODEL,)).start()
+    gmail = FakeGmail(n_messages=args.messages, latency_s=args.gmail_latency_ms / 1000).start()
+    h = Harness(ollama, gmail, debounce_s=args.debounce_ms / 1000)
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+    scenarios = [s for s in SCENARIOS if not only or s.name in only]
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    try:
+        print(f"fake ollama: {args.llm_latency_ms:.0f} ms prompt, {args.tokens_per_s:.0f} tok/s, {args.reply_tokens} tokens; "
+              f"fake gmail: {args.gmail_latency_ms:.0f} ms/RTT, {args.messages} messages; {args.iterations} iterations")
+        print(f"\n{'scenario':<15} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}   HTTP calls per turn")
+        for sc in scenarios:
+            samples, calls = sequential(h, sc, args.iterations)
+            per_turn = ", ".join(f"{k}={v / args.iterations:g}" for k, v in sorted(calls.items()))
+            print(f"{sc.name:<15} {_ms(percentile(samples, 50))} {_ms(percentile(samples, 95))} "
+                  f"{_ms(percentile(samples, 99))}   {per_turn}")
+
+        print(f"\n{'scenario':<15} {'sessions':>8} {'turns/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for sc in scenarios:
+            for n in levels:
+                tput, samples = concurrent(h, sc, n, args.iterations)
+                print(f"{sc.name:<15} {n:>8} {tput:8.1f} {_ms(percentile(samples, 50))} {_ms(percentile(samples, 99))}")
+    finally:
+        h.draft_sync.close()
+        h.llm.close()
+        gmail.stop()
+        ollama.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_gmail_list.py
+# GmailProvider.list_latest: per-message gets (old N+1 loop) vs batch endpoint vs thread-pool fallback
+# run: python -m benchmarks.bench_gmail_list [--messages 50] [--latency-ms 20]
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+from tools.email.gamil_provider import GmailOAuthConfig, GmailProvider, _header_from_message
+from .fake_gmail import FakeGmail, build_fake_service
+
+def legacy_list_latest(p: GmailProvider, limit: int):
+    # the pre-batch implementation: one blocking messages.get per message
+    resp = p.service.users().messages().list(userId="me", q="", labelIds=["INBOX"], includeSpamTrash=False, maxResults=limit).execute()
+    out = []
+    for m in resp.get("messages", []) or []:
+        full = p._metadata_request(m["id"]).execute()
+        out.append(_header_from_message(m["id"], full))
+    return out
+
+def _time(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return result, samples
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    fake = FakeGmail(n_messages=args.messages, latency_s=args.latency_ms / 1000).start()
+    try:
+        provider = GmailProvider(GmailOAuthConfig("", ""), service=build_fake_service(fake.base_url))
+        rows = []
+        baseline = None
+        for label, fn, batch in [
+            ("legacy N+1", lambda: legacy_list_latest(provider, args.messages), True),
+            ("batch", lambda: provider.list_latest(limit=args.messages), True),
+            ("thread-pool fallback", lambda: provider.list_latest(limit=args.messages), False),
+        ]:
+            fake.batch_enabled = batch
+            fake.reset_counters()
+            result, samples = _time(fn, args.repeat)
+            if baseline is None:
+                baseline = result
+            assert result == baseline, f"{label}: output differs from the legacy implementation"
+            rows.append((label, statistics.median(samples), fake.calls["http"] / args.repeat))
+
+        print(f"{args.messages} messages, {args.latency_ms:.0f} ms per HTTP round trip, median of {args.repeat}")
+        for label, med, calls in rows:
+            print(f"  {label:<22} {med * 1000:8.1f} ms   {calls:5.1f} HTTP calls")
+    finally:
+        fake.stop()
+
+if __name__ == "__main__":
+    main()
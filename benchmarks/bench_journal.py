@@ -0,0 +1,77 @@
+# benchmarks/bench_journal.py
+# session journal: bytes on disk (deltas vs full copies per version), restore time, undo time, compaction
+# run: python -m benchmarks.bench_journal [--drafts 20] [--revisions 12] [--words 250]
+from __future__ import annotations
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from server.journal import SessionJournal
+from server.state import DraftState
+
+def body(rng: random.Random, words: int) -> str:
+    vocab = ["meeting", "friday", "thanks", "project", "deadline", "review", "please", "update", "report", "team"]
+    paras = [" ".join(rng.choice(vocab) for _ in range(words // 5)) for _ in range(5)]
+    return "Hi Bob,\n\n" + "\n\n".join(paras) + "\n\nBest regards,\nJason"
+
+def revise(rng: random.Random, text: str) -> str:
+    # an LLM edit: a few words changed, sometimes a sentence added
+    words = text.split(" ")
+    for _ in range(rng.randint(2, 8)):
+        words[rng.randrange(len(words))] = rng.choice(["soon", "formally", "Monday", "shortly", "kindly"])
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), "Let me know if that works for you.")
+    return " ".join(words)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drafts", type=int, default=20)
+    ap.add_argument("--revisions", type=int, default=12)
+    ap.add_argument("--words", type=int, default=250)
+    ap.add_argument("--compact-every", type=int, default=200)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "session.jsonl"
+        j = SessionJournal(str(path), compact_every=args.compact_every)
+        full_bytes = 0
+        compactions = 0
+        for n in range(args.drafts):
+            d = DraftState(to="bob@example.com", subject=f"draft {n}", body=body(rng, args.words), version=1, draft_id=f"d{n}")
+            j.new_draft(d)
+            j.pending({"type": "confirm_send", "draft_id": d.draft_id, "to": d.to, "subject": d.subject})
+            full_bytes += len(json.dumps({"body": d.body}, ensure_ascii=False)) + 1
+            for _ in range(args.revisions):
+                before = j.records
+                base = d.version
+                d.commit(revise(rng, d.body), "llm")
+                j.version(d, base)
+                compactions += j.records < before
+                full_bytes += len(json.dumps({"body": d.body}, ensure_ascii=False)) + 1
+        j.close()
+        size = path.stat().st_size
+
+        restore_ms = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            d2, pending = SessionJournal(str(path)).load()
+            restore_ms.append((time.perf_counter() - t0) * 1000)
+        assert d2.history == d.history and pending["draft_id"] == d.draft_id
+
+        t0 = time.perf_counter()
+        for v in range(1, len(d2.history) + 1):
+            d2.restore(v)
+        undo_us = (time.perf_counter() - t0) / len(d2.history) * 1e6
+
+    print(f"{args.drafts} drafts x {args.revisions} revisions, ~{args.words} words each")
+    print(f"  every version in full (all drafts) {full_bytes / 1024:8.1f} KiB")
+    print(f"  journal on disk (deltas, compacted) {size / 1024:7.1f} KiB  ({compactions} compactions)")
+    print(f"  restore p50 {statistics.median(restore_ms):.2f} ms   undo to any version {undo_us:.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_json_output.py
+# draft_email_auto's JSON call: free text + regex vs ollama `format` read from the stream and cut at the closing brace
+# run: python -m benchmarks.bench_json_output [--calls 20] [--trailing 200]
+from __future__ import annotations
+import argparse
+import json
+import re
+import statistics
+import time
+
+from agents.email_agent import DRAFT_SCHEMA
+from server.llm.json_output import chat_json
+from server.llm.ollama_provider import OllamaProvider
+from .fake_ollama import FakeOllama
+
+MODEL = "llama3.1:8b"
+MESSAGES = [
+    {"role": "system", "content": "You are a professional email assistant.\nReturn STRICT JSON only."},
+    {"role": "user", "content": "User request:\nask bob@example.com whether friday works\nGenerate JSON now."},
+]
+
+def _dig(raw: str) -> dict:
+    m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
+    return json.loads(m.group(0) if m else raw)
+
+def regex_call(llm: OllamaProvider) -> dict:
+    # the old path: no `format`, one blocking call, then dig the object out of the text
+    return _dig(llm.chat(MESSAGES).content)
+
+def schema_blocking_call(llm: OllamaProvider) -> dict:
+    # `format` without the early stop: the model's padding after the object is waited for
+    return _dig(llm.chat(MESSAGES, format=DRAFT_SCHEMA).content)
+
+def schema_call(llm: OllamaProvider) -> dict:
+    return chat_json(llm, MESSAGES, DRAFT_SCHEMA)[0]
+
+def run(fn, llm: OllamaProvider, calls: int) -> list[float]:
+    out = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        data = fn(llm)
+        out.append((time.perf_counter() - t0) * 1000)
+        assert data["to"] == "bob@example.com"
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20)
+    ap.add_argument("--reply-tokens", type=int, default=60)
+    ap.add_argument("--trailing", type=int, default=200, help="whitespace tokens the model pads after the object")
+    ap.add_argument("--tokens-per-s", type=float, default=1000)
+    args = ap.parse_args()
+
+    fake = FakeOllama(prompt_latency_s=0.03, tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens,
+                      models=(MODEL,), json_trailing_tokens=args.trailing).start()
+    llm = OllamaProvider(fake.base_url, MODEL, time_out_s=10)
+    try:
+        print(f"{args.reply_tokens}-word body, {args.trailing} padding tokens after the object, {args.tokens_per_s:.0f} tok/s")
+        for name, fn in (("regex, no format", regex_call), ("schema, wait for done", schema_blocking_call),
+                         ("schema, early stop", schema_call)):
+            fake.reset_counters()
+            ms = run(fn, llm, args.calls)
+            print(f"  {name:22s} p50 {statistics.median(ms):7.1f} ms  max {max(ms):7.1f} ms  "
+                  f"streams closed early {fake.calls['chat_aborted']}/{fake.calls['chat']}")
+    finally:
+        llm.close()
+        fake.stop()
+
+if __name__ == "__main__":
+    main()
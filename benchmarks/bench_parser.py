@@ -0,0 +1,147 @@
+# benchmarks/bench_parser.py
+# classify() vs the original per-step pipeline (parse_user_text, route, is_email_drafting_intent, parse_kv x4)
+# first checks that both agree on a table of inputs (also asserted by tests/test_parser.py), then times them
+# run: python -m benchmarks.bench_parser [--repeat 2000]
+from __future__ import annotations
+import argparse
+import time
+
+from server.orchestrator import Orchestrator, parse_kv, is_email_drafting_intent, extract_email
+from server.parser.classifier import classify
+from server.parser.router import parse_user_text
+from server.parser.schema import Action
+
+CASES = [
+    "",
+    "hello",
+    "what is the capital of France?",
+    "总结我的收件箱",
+    "总结一下最近的邮件",
+    "Check my INBOX please",
+    "check my inbox please",
+    "最新的邮件有哪些",
+    "草拟邮件 to=xxx@school.edu subject=\"trial\" 内容=\"have you finished dinner?\"",
+    "草拟邮件 TO = a@b.com Subject = \"hi there\" content=\"see you\"",
+    "draft an email to prof@school.edu about the deadline",
+    "send an email to bob@example.com asking about office hours",
+    "Email to alice: running late",
+    "帮我写封邮件给 pengj2@carleton.edu 问一下作业",
+    "问一下 tom@uni.edu 明天开会吗",
+    "tom@uni.edu 是谁",
+    "联系 jane@x.org",
+    "my photo=cat.png is nice",
+    "to=",
+    "subject= ",
+    "内容=你好 to=a@b.co",
+    "content=\"unterminated",
+    "show",
+    "SHOW",
+    "help",
+    "?",
+    "cancel",
+    "q",
+    "send",
+    "revise edit make it shorter",
+    "revise m",
+    "revise re more formal",
+    "revise whatever words here",
+    "r e shorter",
+    "edit 更正式一点",
+    "rewrite in Chinese",
+    "regen",
+    "manual",
+    "undo",
+    "undo v2",
+    "撤销",
+    "u",
+    "mail merge in word?",
+    "how do I send a parcel",
+    "发送",
+    "草稿在哪",
+    "邮箱满了怎么办",
+    "  leading and trailing spaces  ",
+    "İstanbul inbox email to=x@y.com",  # lowercasing changes the length: slow path
+    "TO=UPPER@CASE.COM SUBJECT=Hi",
+    "to=\"quoted value\" subject=plain",
+    "subject=\"to=inner\"",
+]
+
+def legacy(text: str) -> dict:
+    t = (text or "").strip()
+    cmd = parse_user_text(t)
+    if cmd.action in {Action.REVISE, Action.UNDO, Action.SHOW, Action.SEND, Action.CANCEL, Action.HELP}:
+        route = "email"
+    else:
+        route = Orchestrator.route(None, t)
+    return {
+        "action": cmd.action,
+        "args": cmd.args,
+        "route": route,
+        "summarize": any(k in t for k in ["总结", "收件箱", "inbox", "最近", "最新"]),
+        "draft_intent": is_email_drafting_intent(t),
+        "to": parse_kv(t, "to"),
+        "subject": parse_kv(t, "subject"),
+        "content": parse_kv(t, "内容") or parse_kv(t, "content"),
+        "email": extract_email(t),
+        "has_to_key": "to=" in t.lower(),
+    }
+
+def compiled(text: str) -> dict:
+    c = classify(text)
+    return {
+        "action": c.command.action,
+        "args": c.command.args,
+        "route": c.route,
+        "summarize": c.summarize,
+        "draft_intent": c.draft_intent,
+        "to": c.to,
+        "subject": c.subject,
+        "content": c.content,
+        "email": c.email,
+        "has_to_key": c.has_to_key,
+    }
+
+def check() -> int:
+    bad = 0
+    for text in CASES:
+        a, b = legacy(text), compiled(text)
+        if a != b:
+            bad += 1
+            diff = {k: (a[k], b[k]) for k in a if a[k] != b[k]}
+            print(f"MISMATCH {text!r}: {diff}")
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    bad = check()
+    print(f"{len(CASES)} cases, {bad} mismatches")
+    if bad:
+        raise SystemExit(1)
+
+    # what the hot path actually needs per turn (email only looked up on the drafting path)
+    def run_legacy():
+        for t in CASES:
+            t = t.strip()
+            parse_user_text(t)
+            Orchestrator.route(None, t)
+            any(k in t for k in ["总结", "收件箱", "inbox", "最近", "最新"])
+            is_email_drafting_intent(t)
+            parse_kv(t, "to"), parse_kv(t, "subject"), parse_kv(t, "内容") or parse_kv(t, "content")
+
+    def run_compiled():
+        for t in CASES:
+            classify(t)
+
+    for label, fn in [("legacy pipeline", run_legacy), ("classify()", run_compiled)]:
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        per_call = (time.perf_counter() - t0) / (args.repeat * len(CASES)) * 1e6
+        print(f"  {label:<16} {per_call:7.2f} us per input")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_pool.py
+# aggregate throughput of PooledOllamaProvider over 1..N fake ollama hosts, then failover when one host dies
+# run: python -m benchmarks.bench_pool [--backends 3] [--clients 12] [--calls 8]
+from __future__ import annotations
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from server.llm.pool import PooledOllamaProvider
+from .fake_ollama import FakeOllama
+
+MODEL = "llama3.1:8b"
+
+def drive(provider, clients: int, calls: int) -> tuple[float, int]:
+    """(calls per second, failed calls)"""
+    def client(_):
+        failed = 0
+        for _ in range(calls):
+            try:
+                provider.chat([{"role": "user", "content": "hello"}])
+            except Exception:
+                failed += 1
+        return failed
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as ex:
+        failed = sum(ex.map(client, range(clients)))
+    return clients * calls / (time.perf_counter() - t0), failed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backends", type=int, default=3)
+    ap.add_argument("--parallel", type=int, default=2, help="calls each fake host generates at once")
+    ap.add_argument("--clients", type=int, default=12)
+    ap.add_argument("--calls", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=30)
+    ap.add_argument("--tokens-per-s", type=float, default=400)
+    args = ap.parse_args()
+
+    hosts = [FakeOllama(prompt_latency_s=args.latency_ms / 1000, tokens_per_s=args.tokens_per_s, reply_tokens=20,
+                        models=(MODEL,), parallel=args.parallel).start() for _ in range(args.backends)]
+    try:
+        print(f"{args.clients} clients x {args.calls} calls, each host runs {args.parallel} calls at once")
+        base = None
+        for n in range(1, args.backends + 1):
+            p = PooledOllamaProvider([h.base_url for h in hosts[:n]], MODEL, time_out_s=10, pool_maxsize=args.clients)
+            p.probe_all()
+            rate, failed = drive(p, args.clients, args.calls)
+            base = base or rate
+            spread = [s["served"] for s in p.stats()]
+            print(f"  {n} host(s): {rate:7.1f} calls/s  x{rate / base:4.2f}  served per host {spread}  failed {failed}")
+            p.close()
+
+        # failover: one host goes away in the middle of the run
+        p = PooledOllamaProvider([h.base_url for h in hosts], MODEL, time_out_s=10, pool_maxsize=args.clients)
+        p.probe_all()
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            fut = ex.submit(drive, p, args.clients, args.calls)
+            time.sleep(0.2)
+            hosts[0].down = True
+            rate, failed = fut.result()
+        print(f"  failover (host 1 stopped mid-run): {rate:7.1f} calls/s  failed {failed}")
+        for s in p.stats():
+            print(f"    {s['base_url']}  healthy={s['healthy']}  served={s['served']}  failures={s['failures']}")
+        p.close()
+    finally:
+        for h in hosts:
+            h.stop()
+
+if __name__ == "__main__":
+    main()
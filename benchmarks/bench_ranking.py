@@ -0,0 +1,88 @@
+# benchmarks/bench_ranking.py
+# EmailRanker (compiled, heap top-k) vs the original rank_emails (per-call sets, nested any(), full sort)
+# run: python -m benchmarks.bench_ranking [--emails 20000] [--k 5]
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import time
+
+from agents.ranking import EmailRanker
+from tools.email.base import EmailHeader
+
+PROFILE = {
+    "important_senders": ["@gradescope.com", "xxx@school.edu", "prof.lee@school.edu", "@canvas.edu"],
+    "important_keywords": ["cs department", "research", "application", "scholarship", "grade", "office hour"],
+}
+
+def legacy_rank(profile: dict, emails: list[EmailHeader]) -> list[EmailHeader]:
+    important_senders = set(profile.get("important_senders", []))
+    important_keywords = set(profile.get("important_keywords", []))
+
+    def score(e: EmailHeader) -> int:
+        s = 0
+        if any(x in (e.from_ or "") for x in important_senders):
+            s += 5
+        subj = (e.subject or "").lower()
+        if any(k.lower() in subj for k in important_keywords):
+            s += 3
+        for kw in ["urgent", "asap", "deadline", "due", "quiz", "midterm", "final"]:
+            if kw in subj:
+                s += 2
+        return s
+
+    return sorted(emails, key=score, reverse=True)
+
+# roughly like a real inbox: most subjects hit nothing, a few hit keywords / urgent words
+PLAIN = ["meeting", "update", "lunch", "report", "hello", "newsletter", "club", "weekly", "invoice", "photos",
+         "trip", "order", "shipped", "welcome", "reminder", "notes", "team", "event", "sale", "thanks"]
+HOT = ["Research", "URGENT", "grade", "Deadline", "quiz", "office hours", "final exam", "scholarship", "due", "asap",
+       "midterm", "application"]
+SENDERS = ["noreply@gradescope.com", "friend@gmail.com", "xxx@school.edu", "shop@store.com", "Prof Lee <prof.lee@school.edu>",
+           "news@media.com", "team@canvas.edu", "someone@school.edu"] + [f"user{i}@example.com" for i in range(200)]
+
+def make_emails(n: int, seed: int = 0) -> list[EmailHeader]:
+    rnd = random.Random(seed)
+
+    def subject() -> str:
+        words = [rnd.choice(PLAIN) for _ in range(rnd.randint(2, 7))]
+        if rnd.random() < 0.15:
+            words.insert(rnd.randrange(len(words)), rnd.choice(HOT))
+        return " ".join(words)
+
+    return [
+        EmailHeader(id=f"m{i}", thread_id=None, from_=rnd.choice(SENDERS), subject=subject(), date="", snippet="")
+        for i in range(n)
+    ]
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emails", type=int, default=20000)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    emails = make_emails(args.emails)
+    ranker = EmailRanker(PROFILE["important_senders"], PROFILE["important_keywords"])
+
+    # same result as the original, for the full order and for top-k
+    assert [e.id for e in ranker.top_k(emails)] == [e.id for e in legacy_rank(PROFILE, emails)]
+    assert [e.id for e in ranker.top_k(emails, args.k)] == [e.id for e in legacy_rank(PROFILE, emails)[:args.k]]
+
+    legacy = _median_ms(lambda: legacy_rank(PROFILE, emails)[:args.k], args.repeat)
+    compile_ms = _median_ms(lambda: EmailRanker(PROFILE["important_senders"], PROFILE["important_keywords"]), args.repeat)
+    compiled = _median_ms(lambda: ranker.top_k(emails, args.k), args.repeat)
+    print(f"{args.emails} headers, top {args.k}, median of {args.repeat}")
+    print(f"  legacy rank_emails     {legacy:8.2f} ms")
+    print(f"  EmailRanker.top_k      {compiled:8.2f} ms   ({legacy / compiled:.1f}x, one-time compile {compile_ms:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_scheduler.py
+# interactive latency under background load: calls straight to a (fake) ollama vs through ScheduledProvider
+# run: python -m benchmarks.bench_scheduler [--background 6] [--interactive 30]
+#   the fake backend works on `parallel` calls at a time and queues the rest FIFO, like ollama with OLLAMA_NUM_PARALLEL
+from __future__ import annotations
+import argparse
+import math
+import threading
+import time
+from collections import deque
+from typing import List
+
+from server.llm.base import LLMResponse
+from server.llm.scheduler import BACKGROUND, ScheduledProvider, priority
+
+class FifoSlots:
+    # a released slot is handed to the oldest waiter (threading.Semaphore lets the releasing thread barge back in)
+    def __init__(self, n: int):
+        self.free = n
+        self.waiters = deque()
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            if self.free and not self.waiters:
+                self.free -= 1
+                return
+            ev = threading.Event()
+            self.waiters.append(ev)
+        ev.wait()
+
+    def __exit__(self, *exc):
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft().set()
+            else:
+                self.free += 1
+
+class FakeBackend:
+    def __init__(self, parallel: int, interactive_s: float, background_s: float):
+        self.slots = FifoSlots(parallel)
+        self.interactive_s = interactive_s
+        self.background_s = background_s
+        self.model = "fake"
+        self.temperature = 0.2
+
+    def chat(self, messages, *, temperature=None, max_tokens=None, **kwargs):
+        with self.slots:
+            time.sleep(self.background_s if messages[0]["content"] == "bg" else self.interactive_s)
+        return LLMResponse(content="ok", raw={})
+
+def p(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[max(0, math.ceil(q / 100 * len(s)) - 1)]
+
+def run(provider, args) -> List[float]:
+    stop = threading.Event()
+
+    def background():
+        with priority(BACKGROUND):
+            while not stop.is_set():
+                provider.chat([{"role": "user", "content": "bg"}])
+
+    threads = [threading.Thread(target=background, daemon=True) for _ in range(args.background)]
+    for t in threads:
+        t.start()
+    time.sleep(args.background_s) # let the background work fill the queue
+    samples = []
+    for _ in range(args.interactive):
+        t0 = time.perf_counter()
+        provider.chat([{"role": "user", "content": "qa"}])
+        samples.append(time.perf_counter() - t0)
+        time.sleep(args.think_ms / 1000)
+    stop.set()
+    for t in threads:
+        t.join()
+    return samples
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--parallel", type=int, default=2, help="calls the backend runs at once")
+    ap.add_argument("--background", type=int, default=6, help="threads summarizing in a loop")
+    ap.add_argument("--interactive", type=int, default=30)
+    ap.add_argument("--interactive-ms", type=float, default=50)
+    ap.add_argument("--background-ms", type=float, default=200)
+    ap.add_argument("--think-ms", type=float, default=20)
+    args = ap.parse_args()
+    args.background_s = args.background_ms / 1000
+
+    rows = []
+    for label, make in [
+        ("no load", lambda b: b),
+        ("direct", lambda b: b),
+        ("scheduled", lambda b: ScheduledProvider(b, max_in_flight=args.parallel, background_max_in_flight=args.parallel - 1)),
+    ]:
+        backend = FakeBackend(args.parallel, args.interactive_ms / 1000, args.background_ms / 1000)
+        provider = make(backend)
+        bg = args.background
+        if label == "no load":
+            args.background = 0
+        samples = run(provider, args)
+        args.background = bg
+        rows.append((label, p(samples, 50), p(samples, 95), getattr(provider, "stats", lambda: None)()))
+
+    print(f"backend: {args.parallel} parallel, interactive {args.interactive_ms:.0f} ms, background {args.background_ms:.0f} ms, "
+          f"{args.background} background threads")
+    for label, p50, p95, stats in rows:
+        print(f"  {label:<10} interactive p50 {p50 * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms" + (f"   {stats}" if stats else ""))
+
+if __name__ == "__main__":
+    main()
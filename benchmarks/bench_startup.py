@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+# cold start cost of the REPL: import time, time to first prompt, time to first answer
+# run: python -m benchmarks.bench_startup [--email] [--repeat 5]
+#   QA-only session: start, wait for the prompt, quit
+#   --email: also send "总结我的收件箱" (needs Gmail credentials + a running ollama)
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PROMPT = b"You>"
+
+def import_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, check=True)
+    return float(out.stdout.decode().strip().splitlines()[-1])
+
+def _read_until_prompt(proc, buf: bytearray) -> None:
+    while PROMPT not in buf:
+        ch = proc.stdout.read(1)
+        if not ch:
+            raise RuntimeError(f"REPL exited before prompting:\n{buf.decode(errors='replace')}")
+        buf.extend(ch)
+
+def session_times(lines: list[str]) -> tuple[float, float | None]:
+    """(time to first prompt, time until the prompt after the last input line)"""
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "scripts.run_orchestrator"], cwd=ROOT, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        buf = bytearray()
+        _read_until_prompt(proc, buf)
+        first_prompt = time.perf_counter() - t0
+        answered = None
+        for line in lines:
+            buf.clear()
+            proc.stdin.write(line.encode("utf-8") + b"\n")
+            proc.stdin.flush()
+            _read_until_prompt(proc, buf)
+            answered = time.perf_counter() - t0
+        proc.stdin.write(b"q\n")
+        proc.stdin.flush()
+        proc.wait(timeout=30)
+        return first_prompt, answered
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--email", action="store_true", help="also time an inbox summary session")
+    args = ap.parse_args()
+
+    def med(xs):
+        return statistics.median(xs) * 1000
+
+    print(f"median of {args.repeat} cold starts")
+    for module in ["scripts.run_orchestrator", "tools.email.gamil_provider"]:
+        try:
+            samples = [import_time(module) for _ in range(args.repeat)]
+            print(f"  import {module:<30} {med(samples):8.1f} ms")
+        except subprocess.CalledProcessError as e:
+            print(f"  import {module:<30} failed: {e.stderr.decode().strip().splitlines()[-1]}")
+
+    qa = [session_times([])[0] for _ in range(args.repeat)]
+    print(f"  QA-only: first prompt           {med(qa):8.1f} ms")
+
+    if args.email:
+        runs = [session_times(["总结我的收件箱"]) for _ in range(args.repeat)]
+        print(f"  email:   first prompt           {med([r[0] for r in runs]):8.1f} ms")
+        print(f"  email:   first inbox summary    {med([r[1] for r in runs]):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
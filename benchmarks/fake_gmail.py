@@ -0,0 +1,241 @@
+# benchmarks/fake_gmail.py
+# a tiny local stand-in for the Gmail REST API (messages, drafts, profile/history, batch), used by the benchmarks
+from __future__ import annotations
+import base64
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+def make_message(i: int) -> dict:
+    return {
+        "id": f"m{i:06d}",
+        "threadId": f"t{i:06d}",
+        "labelIds": ["INBOX"],
+        "snippet": f"snippet of message {i}",
+        "internalDate": str(int(time.time() * 1000) - i * 60_000),
+        "historyId": str(1000 + i),
+        "payload": {"headers": [
+            {"name": "From", "value": f"sender{i % 7} <sender{i % 7}@school.edu>"},
+            {"name": "Subject", "value": f"subject {i}" + (" deadline" if i % 5 == 0 else "")},
+            {"name": "Date", "value": time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(time.time() - i * 60))},
+        ]},
+    }
+
+def full_message(msg: dict, words: int) -> dict:
+    # format=full: the metadata message plus a multipart/alternative body (plain + html copy)
+    i = int(msg["id"][1:])
+    text = f"Hello,\n\nThis is message {i}. " + " ".join(f"word{k}" for k in range(words)) + "\n\nThanks"
+    html = "<html><body>" + "".join(f"<p>{p}</p>" for p in text.split("\n\n")) + "</body></html>"
+    data = lambda t: base64.urlsafe_b64encode(t.encode("utf-8")).decode().rstrip("=")
+    payload = dict(msg["payload"], mimeType="multipart/alternative", parts=[
+        {"mimeType": "text/plain", "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+         "body": {"size": len(text), "data": data(text)}},
+        {"mimeType": "text/html", "headers": [{"name": "Content-Type", "value": "text/html; charset=UTF-8"}],
+         "body": {"size": len(html), "data": data(html)}},
+    ])
+    return dict(msg, payload=payload)
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients dropping idle keep-alive connections at shutdown is expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class FakeGmail:
+    """
+    Holds the mailbox and the HTTP counters; latency_s is added to every HTTP request (one RTT).
+    Set batch_enabled=False to make the batch endpoint fail with 500.
+    body_words: length of the bodies served for messages.get(format=full).
+    """
+    def __init__(self, n_messages: int = 50, latency_s: float = 0.02, body_words: int = 300):
+        self.latency_s = latency_s
+        self.body_words = body_words
+        self.batch_enabled = True
+        self.messages: Dict[str, dict] = {}
+        for i in range(n_messages):
+            m = make_message(i)
+            self.messages[m["id"]] = m
+        self.drafts: Dict[str, dict] = {}
+        self.sent: List[str] = []
+        self.history_id = 1000 + n_messages
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    # ---- lifecycle ----
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGmail":
+        fake = self
+
+        class Handler(_Handler):
+            gmail = fake
+
+        self.server = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.calls.clear()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] += 1
+
+    # ---- API ----
+    def route(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        u = urlparse(path)
+        qs = parse_qs(u.query)
+        p = u.path
+        m = re.fullmatch(r"/gmail/v1/users/me/messages", p)
+        if m and method == "GET":
+            self.count("messages.list")
+            limit = int(qs.get("maxResults", ["100"])[0])
+            ids = sorted(self.messages, key=lambda k: -int(self.messages[k]["internalDate"]))
+            return 200, {"messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in ids[:limit]],
+                         "resultSizeEstimate": len(ids)}
+        m = re.fullmatch(r"/gmail/v1/users/me/messages/([^/]+)", p)
+        if m and method == "GET":
+            self.count("messages.get")
+            msg = self.messages.get(m.group(1))
+            if msg is None:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if qs.get("format", ["full"])[0] == "full":
+                self.count("messages.get.full")
+                return 200, full_message(msg, self.body_words)
+            return 200, msg
+        if p == "/gmail/v1/users/me/profile" and method == "GET":
+            self.count("users.getProfile")
+            return 200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+        if p == "/gmail/v1/users/me/history" and method == "GET":
+            self.count("history.list")
+            return 200, {"history": [], "historyId": str(self.history_id)}
+        if p == "/gmail/v1/users/me/drafts" and method == "POST":
+            self.count("drafts.create")
+            with self.lock:
+                draft_id = f"d{len(self.drafts) + 1:06d}"
+                self.drafts[draft_id] = json.loads(body or b"{}").get("message", {})
+            return 200, {"id": draft_id, "message": {"id": f"dm{draft_id}"}}
+        m = re.fullmatch(r"/gmail/v1/users/me/drafts/([^/]+)", p)
+        if m and method == "PUT" and m.group(1) != "send":
+            self.count("drafts.update")
+            if m.group(1) not in self.drafts:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            self.drafts[m.group(1)] = json.loads(body or b"{}").get("message", {})
+            return 200, {"id": m.group(1)}
+        if p == "/gmail/v1/users/me/drafts/send" and method == "POST":
+            self.count("drafts.send")
+            draft_id = json.loads(body or b"{}").get("id")
+            if draft_id not in self.drafts:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            with self.lock:
+                self.sent.append(draft_id)
+            return 200, {"id": f"sent-{draft_id}", "labelIds": ["SENT"]}
+        return 404, {"error": {"code": 404, "message": f"no fake route for {method} {p}"}}
+
+class _Handler(BaseHTTPRequestHandler):
+    gmail: FakeGmail
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status: int, payload: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, method: str) -> None:
+        body = self._body()
+        time.sleep(self.gmail.latency_s)
+        self.gmail.count("http")
+        if self.path.startswith("/batch"):
+            self._batch(body)
+            return
+        status, data = self.gmail.route(method, self.path, body)
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _batch(self, body: bytes) -> None:
+        self.gmail.count("batch")
+        if not self.gmail.batch_enabled:
+            self._send(500, b'{"error": {"code": 500, "message": "batch disabled"}}', "application/json")
+            return
+        ctype = self.headers.get("Content-Type", "")
+        boundary = ctype.split("boundary=")[-1].strip('"')
+        out_boundary = "batch_fake_boundary"
+        parts: List[str] = []
+        # googleapiclient writes the batch body with bare "\n" line endings, other clients use "\r\n"
+        body = body.replace(b"\r\n", b"\n")
+        for raw in body.split(b"--" + boundary.encode()):
+            raw = raw.strip()
+            if not raw or raw == b"--":
+                continue
+            head, _, inner = raw.partition(b"\n\n")
+            cid = ""
+            for line in head.decode().splitlines():
+                if line.lower().startswith("content-id:"):
+                    cid = line.split(":", 1)[1].strip().strip("<>")
+            req_line, _, rest = inner.partition(b"\n")
+            _, _, inner_body = rest.partition(b"\n\n")
+            method, path, _ = req_line.decode().split(" ", 2)
+            status, data = self.gmail.route(method, path, inner_body)
+            payload = json.dumps(data)
+            parts.append(
+                f"--{out_boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{cid}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'ERROR'}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(payload.encode())}\r\n\r\n"
+                f"{payload}\r\n"
+            )
+        parts.append(f"--{out_boundary}--\r\n")
+        self._send(200, "".join(parts).encode("utf-8"), f"multipart/mixed; boundary={out_boundary}")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+def build_fake_service(base_url: str):
+    """googleapiclient service whose every call (including batch) goes to the fake server."""
+    import httplib2
+    import googleapiclient
+    from pathlib import Path
+    from googleapiclient.discovery import build_from_document
+
+    doc_path = Path(googleapiclient.__file__).parent / "discovery_cache" / "documents" / "gmail.v1.json"
+    doc = json.loads(doc_path.read_text(encoding="utf-8"))
+    doc["rootUrl"] = base_url.rstrip("/") + "/"
+    return build_from_document(doc, http=httplib2.Http())
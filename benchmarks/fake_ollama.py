@@ -0,0 +1,184 @@
+# benchmarks/fake_ollama.py
+# local stand-in for ollama's /api/chat (+ /api/tags) with configurable latency and generation speed
+from __future__ import annotations
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .fake_gmail import QuietHTTPServer
+
+_EMAIL = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", re.IGNORECASE)
+
+class FakeOllama:
+    """
+    prompt_latency_s: delay before the first token (prompt evaluation),
+    tokens_per_s / reply_tokens: generation speed and answer length.
+    parallel: calls generated at once (OLLAMA_NUM_PARALLEL), None = unlimited.
+    json_trailing_tokens: whitespace tokens generated after a `format` answer's closing brace,
+    like a constrained model that keeps padding until num_predict.
+    """
+    def __init__(self, prompt_latency_s: float = 0.05, tokens_per_s: float = 200.0, reply_tokens: int = 40,
+                 models: tuple = ("llama3.1:8b",), parallel: Optional[int] = None, json_trailing_tokens: int = 0):
+        self.prompt_latency_s = prompt_latency_s
+        self.tokens_per_s = tokens_per_s
+        self.reply_tokens = reply_tokens
+        self.models = list(models)
+        self.slots = threading.BoundedSemaphore(parallel) if parallel else None
+        self.json_trailing_tokens = json_trailing_tokens
+        self.down = False # set to drop every request (keep-alive connections included), like a crashed host
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        fake = self
+
+        class Handler(_Handler):
+            ollama = fake
+
+        self.server = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.calls.clear()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] += 1
+
+    def reply_for(self, payload: dict) -> str:
+        messages = payload.get("messages") or []
+        system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user = (messages[-1].get("content", "") if messages else "")
+        if '"ops"' in system:
+            # patch edit: a small op list instead of the whole body
+            return json.dumps({"ops": [{"op": "replace", "paragraph": 1, "text": " ".join(["short"] * 5)}]})
+        if payload.get("format") or "STRICT JSON" in system:
+            m = _EMAIL.search(user)
+            return json.dumps({"to": m.group(0) if m else "", "subject": "Quick question",
+                               "body": "Hi,\n\n" + " ".join(["word"] * self.reply_tokens) + "\n\nBest regards,\nJason"})
+        return " ".join(f"tok{i}" for i in range(self.reply_tokens))
+
+def _tokens(text: str) -> list[str]:
+    # ~ one token per word, whitespace kept so the pieces join back to the full text
+    return re.findall(r"\S+\s*|\s+", text) or [text]
+
+class _Handler(BaseHTTPRequestHandler):
+    ollama: FakeOllama
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, data: dict) -> None:
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dropped(self) -> bool:
+        if self.ollama.down:
+            self.close_connection = True # no response: the client sees the connection reset
+            return True
+        return False
+
+    def do_GET(self):
+        if self._dropped():
+            return
+        if self.path == "/api/tags":
+            self.ollama.count("tags")
+            self._json(200, {"models": [{"name": m, "model": m} for m in self.ollama.models]})
+            return
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(n) or b"{}")
+        if self._dropped():
+            return
+        if self.path != "/api/chat":
+            self._json(404, {"error": "not found"})
+            return
+        o = self.ollama
+        o.count("chat")
+        model = payload.get("model", "")
+        if model not in o.models:
+            self._json(404, {"error": f"model '{model}' not found"})
+            return
+
+        if o.slots is not None:
+            with o.slots:
+                self._generate(o, payload, model)
+        else:
+            self._generate(o, payload, model)
+
+    def _generate(self, o: FakeOllama, payload: dict, model: str) -> None:
+        prompt_tokens = sum(len(_tokens(m.get("content", ""))) for m in payload.get("messages") or [])
+        reply = o.reply_for(payload)
+        pieces = _tokens(reply)
+        if payload.get("format"):
+            pieces += ["\n"] * o.json_trailing_tokens
+        limit = (payload.get("options") or {}).get("num_predict")
+        if limit:
+            pieces = pieces[:int(limit)]
+        per_token = 1.0 / o.tokens_per_s if o.tokens_per_s else 0.0
+        t0 = time.perf_counter()
+        time.sleep(o.prompt_latency_s)
+        prompt_ns = int((time.perf_counter() - t0) * 1e9)
+
+        def stats(eval_ns: int) -> dict:
+            return {
+                "model": model, "done": True, "done_reason": "stop",
+                "total_duration": prompt_ns + eval_ns, "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": prompt_ns,
+                "eval_count": len(pieces), "eval_duration": eval_ns,
+            }
+
+        if not payload.get("stream", True):
+            t1 = time.perf_counter()
+            time.sleep(per_token * len(pieces))
+            data = stats(int((time.perf_counter() - t1) * 1e9))
+            data["message"] = {"role": "assistant", "content": "".join(pieces)}
+            self._json(200, data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        t1 = time.perf_counter()
+        try:
+            for p in pieces:
+                time.sleep(per_token)
+                self._chunk({"model": model, "message": {"role": "assistant", "content": p}, "done": False})
+            last = stats(int((time.perf_counter() - t1) * 1e9))
+            last["message"] = {"role": "assistant", "content": ""}
+            self._chunk(last)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            o.count("chat_aborted") # client closed the stream early
+
+    def _chunk(self, data: dict) -> None:
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
@@ -4,26 +4,84 @@ import yaml
 from server.llm.factory import build_provider
 from server.orchestrator import Orchestrator
 from tools.email.factory import build_email_provider
+from tools.email.draft_sync import DraftSyncQueue
+from agents.summary_cache import MessageSummaryCache
+from server.journal import SessionJournal
+from server import tracing
 
 def load_cfg():
     with open ('configs/config.yaml','r',encoding = 'utf-8') as f:
         return yaml.safe_load(f)
 
+def context_budget(cfg) -> int:
+    # prompt tokens = llm.num_ctx minus what the answer needs (email.context.reserve_output_tokens)
+    ctx = cfg.get("email", {}).get("context", {}) or {}
+    if ctx.get("budget_tokens"):
+        return int(ctx["budget_tokens"])
+    num_ctx = int(cfg.get("llm", {}).get("num_ctx") or 4096)
+    return max(512, num_ctx - int(ctx.get("reserve_output_tokens", 1024)))
+
+def email_agent_options(cfg) -> dict:
+    sm = cfg.get("email", {}).get("summarize", {}) or {}
+    rv = cfg.get("email", {}).get("revision", {}) or {}
+    mode = sm.get("mode", "single")
+    return {
+        "summary_mode": mode,
+        "summary_cache": MessageSummaryCache(sm.get("cache_path")) if mode == "map_reduce" else None,
+        "map_workers": int(sm.get("map_workers", 2)),
+        "map_max_messages": int(sm.get("max_messages", 200)),
+        "revision_mode": rv.get("mode", "oneshot"),
+        "revision_max_turns": int(rv.get("max_turns", 8)),
+        "edit_mode": rv.get("edit", "full"),
+        "context_budget": context_budget(cfg),
+        "full_bodies": int(sm.get("full_bodies", 0)),
+        "body_max_chars": int(sm.get("body_max_chars", 4000)),
+    }
+
 def main():
     cfg = load_cfg()
+    tracing.configure(cfg.get("tracing"))
     llm_provider = build_provider(cfg) #make config real provider
     profile = cfg.get("profile",{})
-    email_provider = build_email_provider(cfg)
-    orch = Orchestrator(llm_provider=llm_provider, email_provider= email_provider,profile = profile) #send provider to orchestrator, and orchestrator assign work to agents
+    email_provider = build_email_provider(cfg, lazy=True) # OAuth + Gmail service only on first email request
+    draft_sync = DraftSyncQueue(email_provider, debounce_s=float(cfg.get("email", {}).get("draft_sync_debounce_s", 2.0)))
+    sc = cfg.get("session", {}) or {}
+    journal = SessionJournal(sc["journal_path"], compact_every=int(sc.get("compact_every", 200))) if sc.get("journal_path") else None
+    orch = Orchestrator(llm_provider=llm_provider, email_provider= email_provider,profile = profile, draft_sync=draft_sync, email_options=email_agent_options(cfg), journal=journal) #send provider to orchestrator, and orchestrator assign work to agents
+    if orch.session.draft is not None:
+        d = orch.session.draft
+        print(f"(restored draft v{d.version} to {d.to or '?'}: {d.subject or ''}{' - waiting for CONFIRM SEND' if orch.pending else ''})")
+
+    pf = cfg.get("prefetch", {}) or {}
+    if pf.get("enabled", False):
+        orch.start_prefetch(interval_s=float(pf.get("interval_s", 300)), days=int(pf.get("days", 7)))
 
     print("Local Agent System(type 'q' to quit)")
     while True: #little interface
         user_text = input('\nYou>').strip()
         if user_text.lower() in{'q','quit','exit'}:
+            draft_sync.close() # push the last revision to gmail before leaving
+            if journal is not None:
+                journal.close()
+            dump_path = (cfg.get("tracing") or {}).get("dump_path")
+            if dump_path and tracing.REGISTRY.enabled:
+                tracing.dump_json(dump_path)
             print('Bye!')
             break
-        result = orch.handle(user_text)
-        print("\nAssistant>\n"+result.content)
+        streamed = []
+        def on_token(tok: str):
+            if not streamed:
+                print("\nAssistant>")
+            streamed.append(tok)
+            print(tok, end="", flush=True)
+
+        result = orch.handle(user_text, on_token=on_token)
+        if streamed:
+            print()
+            if result.ttft_s is not None:
+                print(f"(first token after {result.ttft_s:.2f}s)")
+        else:
+            print("\nAssistant>\n"+result.content)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from server.llm.factory import build_provider
+from server.orchestrator import Orchestrator
+from server.session_server import SessionManager, serve
+from server.prefetch import InboxPrefetcher
+from server import tracing
+from agents.email_agent import EmailAgent
+from tools.email.factory import build_email_provider
+from tools.email.draft_sync import DraftSyncQueue
+from scripts.run_orchestrator import load_cfg, email_agent_options
+
+def main():
+    cfg = load_cfg()
+    server_cfg = cfg.get("server", {}) or {}
+    tracing.configure(cfg.get("tracing"))
+    llm_provider = build_provider(cfg)
+    email_provider = build_email_provider(cfg, lazy=True) # OAuth + Gmail service only on first email request
+    profile = cfg.get("profile", {})
+    email_options = email_agent_options(cfg)
+    draft_sync = DraftSyncQueue(email_provider, debounce_s=float(cfg.get("email", {}).get("draft_sync_debounce_s", 2.0)))
+
+    # one background inbox summary for all sessions (they share the mailbox)
+    prefetcher = None
+    pf = cfg.get("prefetch", {}) or {}
+    if pf.get("enabled", False):
+        prefetch_agent = EmailAgent(llm_provider, email_provider, profile, **email_options)
+        prefetcher = InboxPrefetcher(lambda: prefetch_agent, interval_s=float(pf.get("interval_s", 300)), days=int(pf.get("days", 7)))
+        prefetcher.start()
+
+    # providers are shared, session state is not: one Orchestrator per session
+    manager = SessionManager(
+        lambda: Orchestrator(llm_provider=llm_provider, email_provider=email_provider, profile=profile, interactive=False,
+                             draft_sync=draft_sync, prefetcher=prefetcher, email_options=email_options),
+        idle_ttl_s=float(server_cfg.get("idle_ttl_s", 1800)),
+        max_sessions=int(server_cfg.get("max_sessions", 100)),
+        journal_dir=server_cfg.get("journal_dir"),
+        journal_compact_every=int(server_cfg.get("journal_compact_every", 200)),
+    )
+    manager.start_reaper()
+    host = server_cfg.get("host", "127.0.0.1")
+    port = int(server_cfg.get("port", 8765))
+    httpd = serve(manager, host, port)
+    print(f"Agent server on http://{host}:{port} (POST /sessions, POST /sessions/<id>/messages, GET /metrics)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Bye!")
+    finally:
+        manager.stop()
+        draft_sync.close()
+        httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# server/journal.py
+# append-only journal of one session: the open draft, its versions (stored as word-level deltas) and the pending-send gate.
+# Replaying it on startup restores the session without any LLM or gmail call.
+from __future__ import annotations
+import json
+import os
+import re
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.state import DraftState
+
+_WORDS = re.compile(r"\S+\s*|\s+")
+
+def _words(text: str) -> List[str]:
+    return _WORDS.findall(text)
+
+def diff(old: str, new: str) -> List[list]:
+    """[[start, end, text], ...]: words old[start:end] are replaced by text (word indexes into old)"""
+    a, b = _words(old), _words(new)
+    sm = SequenceMatcher(None, a, b, autojunk=False)
+    return [[i1, i2, "".join(b[j1:j2])] for tag, i1, i2, j1, j2 in sm.get_opcodes() if tag != "equal"]
+
+def patch(old: str, delta: List[list]) -> str:
+    words = _words(old)
+    for start, end, text in reversed(delta): # back to front, so earlier indexes stay valid
+        words[start:end] = [text]
+    return "".join(words)
+
+class SessionJournal:
+    """
+    One JSON record per line:
+      {"op": "draft", ...}                      a new draft, v1 body in full
+      {"op": "version", "v", "base", "delta"}  body of v = patch(body of base, delta)
+      {"op": "undo", "v"}                       current version moved back (or forward) to v
+      {"op": "pending", "pending"}              confirm-send gate set / cleared (null)
+      {"op": "sent"}                            the draft was sent: no open draft any more
+    Every record is appended and flushed before the turn returns. Once the file holds compact_every
+    records (and twice what the live state needs), it is rewritten with only the current draft's
+    chain and the gate: older drafts and undo / gate churn go, every version of the draft stays.
+    """
+    def __init__(self, path: str, compact_every: int = 200, fsync: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.records = 0 # lines in the file
+        self._draft: Optional[DraftState] = None
+        self._pending: Optional[dict] = None
+        self._f = None
+
+    # ---- replay ----
+    def load(self) -> Tuple[Optional[DraftState], Optional[dict]]:
+        draft: Optional[DraftState] = None
+        pending: Optional[dict] = None
+        self.records = 0
+        if self.path.exists():
+            self._truncate_torn_tail()
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records += 1
+                    draft, pending = self._apply(rec, draft, pending)
+        self._draft, self._pending = draft, pending
+        return draft, pending
+
+    def _truncate_torn_tail(self) -> None:
+        # a crash mid-write leaves a last line without "\n": cut it off, otherwise the next append
+        # lands on the same line and that record is lost on the following replay
+        with self.path.open("rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+
+    @staticmethod
+    def _apply(rec: Dict[str, Any], draft: Optional[DraftState], pending: Optional[dict]):
+        op = rec.get("op")
+        if op == "draft":
+            draft = DraftState(to=rec.get("to"), subject=rec.get("subject"), body=rec["body"], version=1,
+                               source=rec.get("source", "llm"), draft_id=rec.get("draft_id"))
+        elif op == "version" and draft is not None:
+            b = rec.get("base")
+            if not isinstance(b, int) or not 1 <= b <= len(draft.history):
+                return draft, pending # its base record was lost: skip rather than fail the whole replay
+            base = draft.history[b - 1][0]
+            draft.commit(patch(base, rec["delta"]), rec.get("source", "mixed"))
+        elif op == "undo" and draft is not None:
+            draft.restore(rec["v"])
+        elif op == "pending":
+            pending = rec.get("pending")
+        elif op == "sent":
+            draft = None
+        return draft, pending
+
+    # ---- append ----
+    def _write(self, recs: List[Dict[str, Any]]) -> None:
+        if self._f is None:
+            self._f = self.path.open("a", encoding="utf-8")
+        self._f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs))
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+        self.records += len(recs)
+        self._maybe_compact()
+
+    def new_draft(self, d: DraftState) -> None:
+        self._draft = d
+        self._write([{"op": "draft", "to": d.to, "subject": d.subject, "body": d.body or "",
+                      "source": d.source, "draft_id": d.draft_id}])
+
+    def version(self, d: DraftState, base: int) -> None:
+        # d has just committed its newest version, made from version `base`
+        self._draft = d
+        self._write([{"op": "version", "v": d.version, "base": base, "source": d.source,
+                      "delta": diff(d.history[base - 1][0], d.body or "")}])
+
+    def undo(self, d: DraftState) -> None:
+        self._draft = d
+        self._write([{"op": "undo", "v": d.version}])
+
+    def pending(self, pending: Optional[dict]) -> None:
+        self._pending = pending
+        self._write([{"op": "pending", "pending": pending}])
+
+    def sent(self) -> None:
+        self._draft = None
+        self._write([{"op": "sent"}])
+
+    # ---- compaction ----
+    def _live(self) -> List[Dict[str, Any]]:
+        recs: List[Dict[str, Any]] = []
+        d = self._draft
+        if d is not None and d.history:
+            body, source = d.history[0]
+            recs.append({"op": "draft", "to": d.to, "subject": d.subject, "body": body, "source": source,
+                         "draft_id": d.draft_id})
+            for v in range(2, len(d.history) + 1):
+                # each version against its predecessor: same bodies, base no longer matters once written out
+                body, source = d.history[v - 1]
+                recs.append({"op": "version", "v": v, "base": v - 1, "source": source,
+                             "delta": diff(d.history[v - 2][0], body)})
+            if d.version != len(d.history):
+                recs.append({"op": "undo", "v": d.version})
+        if self._pending is not None:
+            recs.append({"op": "pending", "pending": self._pending})
+        return recs
+
+    def _maybe_compact(self) -> None:
+        if self.records < self.compact_every:
+            return
+        live = (len(self._draft.history) + 1 if self._draft is not None else 0) + 1
+        if self.records >= 2 * live:
+            self.compact()
+
+    def compact(self) -> None:
+        recs = self._live()
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        os.replace(tmp, self.path) # atomic: a crash leaves either the old or the compacted journal
+        self.records = len(recs)
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def remove(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
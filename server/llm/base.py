@@ -1,5 +1,6 @@
-from typing import Protocol, List, Dict, Optional
+from typing import Protocol, List, Dict, Optional, Iterator, AsyncIterator, Callable
 from dataclasses import dataclass
+import time
 Message = Dict[str,str] #{"role":"...","content":'...'}
 
 @dataclass
@@ -7,6 +8,14 @@ class LLMResponse:
     content:str # the output that agent need to pay attention to
     raw:dict|None = None
 
+@dataclass
+class LLMChunk:
+    content:str # the piece of text generated since the last chunk
+    done:bool = False
+    raw:dict|None = None # only the final chunk carries the provider stats
+
+TokenCallback = Callable[[str], None]
+
 class LLMProvider(Protocol):
     def chat(
         self,
@@ -14,4 +23,68 @@ class LLMProvider(Protocol):
         *,# force following parameters paasing by key words, ex: provider.chat(messages, temperature = 0.2) instead of provider.chat(messages, 0.2)
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-    ) -> LLMResponse: ...
\ No newline at end of file
+    ) -> LLMResponse: ...
+
+    def chat_stream(
+        self,
+        messages:List[Message],
+        *,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Iterator[LLMChunk]: ... # yields chunks as soon as the model produces them
+
+class AsyncLLMProvider(Protocol):
+    # same contract as LLMProvider, but awaitable: several calls can run concurrently on one event loop
+    async def achat(
+        self,
+        messages:List[Message],
+        *,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> LLMResponse: ...
+
+    def achat_stream(
+        self,
+        messages:List[Message],
+        *,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[LLMChunk]: ...
+
+def stream_chat(
+    provider: LLMProvider,
+    messages: List[Message],
+    on_token: TokenCallback,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> LLMResponse:
+    """
+    Forward every generated token to on_token and return the full response.
+    raw["ttft_s"] is the time to first token; providers without chat_stream fall back to chat().
+    """
+    start = time.perf_counter()
+    stream = getattr(provider, "chat_stream", None)
+    if stream is None:
+        resp = provider.chat(messages, temperature=temperature, max_tokens=max_tokens)
+        ttft = time.perf_counter() - start
+        if resp.content:
+            on_token(resp.content)
+        raw = dict(resp.raw or {})
+        raw.update({"ttft_s": ttft, "total_s": ttft})
+        return LLMResponse(content=resp.content, raw=raw)
+
+    ttft: Optional[float] = None
+    parts: List[str] = []
+    raw: dict = {}
+    for chunk in stream(messages, temperature=temperature, max_tokens=max_tokens):
+        if chunk.content:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk.content)
+            on_token(chunk.content)
+        if chunk.done and chunk.raw:
+            raw.update(chunk.raw)
+    raw["ttft_s"] = ttft
+    raw["total_s"] = time.perf_counter() - start
+    return LLMResponse(content="".join(parts), raw=raw)
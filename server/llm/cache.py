@@ -0,0 +1,233 @@
+# server/llm/cache.py
+# content-addressed response cache that wraps any LLMProvider
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .base import LLMChunk, LLMProvider, LLMResponse, Message
+
+class _Flight:
+    # one in-progress generation that identical concurrent calls wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.resp: Optional[LLMResponse] = None
+        self.error: Optional[BaseException] = None
+        self.abandoned = False # a streaming leader whose consumer stopped early: waiters generate themselves
+
+class CachedProvider:
+    """
+    Key = sha256(model, messages, temperature, max_tokens, extra options).
+    Only calls whose effective temperature <= max_temperature are cached (default: temperature 0 only),
+    everything else goes straight to the wrapped provider.
+    """
+    def __init__(self, inner: LLMProvider, max_entries: int = 256, ttl_s: Optional[float] = 86400,
+                 disk_dir: Optional[str] = None, max_temperature: float = 0.0):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_temperature = max_temperature
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._mem: "OrderedDict[str, Tuple[float, str, dict]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0 # calls that waited on an identical in-flight generation
+        self.bypassed = 0 # calls not cacheable (temperature too high)
+        self.evictions = 0
+
+    @property
+    def model(self) -> str:
+        return getattr(self.inner, "model", "")
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return getattr(self.inner, "temperature", None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "size": len(self._mem),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.disk_dir:
+            for p in self.disk_dir.glob("*.json"):
+                p.unlink(missing_ok=True)
+
+    # ---- keys / storage ----
+    def _cacheable(self, temperature: Optional[float]) -> bool:
+        t = self.temperature if temperature is None else temperature
+        return t is not None and float(t) <= self.max_temperature
+
+    def _key(self, messages: List[Message], temperature: Optional[float], max_tokens: Optional[int], extra: Dict[str, Any]) -> str:
+        t = self.temperature if temperature is None else temperature
+        blob = json.dumps(
+            {"model": self.model, "messages": messages, "temperature": t, "max_tokens": max_tokens, "extra": extra},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_s is not None and time.time() - created > self.ttl_s
+
+    def _get(self, key: str) -> Optional[LLMResponse]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                created, content, raw = item
+                if not self._expired(created):
+                    self._mem.move_to_end(key)
+                    return LLMResponse(content=content, raw=dict(raw, cache="hit"))
+                del self._mem[key]
+        if not self.disk_dir:
+            return None
+        p = self.disk_dir / f"{key}.json"
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if self._expired(data.get("created", 0)):
+            p.unlink(missing_ok=True)
+            return None
+        self._put_mem(key, data["created"], data["content"], data.get("raw") or {})
+        return LLMResponse(content=data["content"], raw=dict(data.get("raw") or {}, cache="hit"))
+
+    def _put_mem(self, key: str, created: float, content: str, raw: dict) -> None:
+        with self._lock:
+            self._mem[key] = (created, content, raw)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self.evictions += 1
+
+    def _put(self, key: str, resp: LLMResponse) -> None:
+        created = time.time()
+        raw = resp.raw or {}
+        self._put_mem(key, created, resp.content, raw)
+        if self.disk_dir:
+            p = self.disk_dir / f"{key}.json"
+            tmp = p.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"created": created, "content": resp.content, "raw": raw}, ensure_ascii=False, default=str), encoding="utf-8")
+            os.replace(tmp, p) # atomic, readers never see half a file
+
+    # ---- LLMProvider ----
+    def chat(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> LLMResponse:
+        if not self._cacheable(temperature):
+            with self._lock:
+                self.bypassed += 1
+            return self.inner.chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+
+        key = self._key(messages, temperature, max_tokens, kwargs)
+        hit = self._get(key)
+        if hit is not None:
+            with self._lock:
+                self.hits += 1
+            return hit
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.abandoned:
+                return self.chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+            if flight.error is not None:
+                raise flight.error
+            return flight.resp
+
+        try:
+            resp = self.inner.chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+            self._put(key, resp)
+            flight.resp = resp
+            return resp
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def chat_stream(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> Iterator[LLMChunk]:
+        if not self._cacheable(temperature):
+            with self._lock:
+                self.bypassed += 1
+            yield from self.inner.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+            return
+
+        key = self._key(messages, temperature, max_tokens, kwargs)
+        while True:
+            hit = self._get(key)
+            if hit is not None:
+                with self._lock:
+                    self.hits += 1
+                yield LLMChunk(content=hit.content, done=True, raw=hit.raw)
+                return
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.misses += 1
+            if leader:
+                break
+            # someone is already generating this exact answer (chat() or a stream), reuse it
+            flight.done.wait()
+            if flight.error is None:
+                with self._lock:
+                    self.shared += 1
+                yield LLMChunk(content=flight.resp.content, done=True, raw=flight.resp.raw)
+                return
+            # the leader failed or its stream was abandoned: look again, and generate if nobody else does
+
+        parts: List[str] = []
+        try:
+            for chunk in self.inner.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, **kwargs):
+                parts.append(chunk.content)
+                if chunk.done:
+                    # only complete generations are stored; waiters get the answer before our consumer does
+                    flight.resp = LLMResponse(content="".join(parts), raw=chunk.raw)
+                    self._put(key, flight.resp)
+                    self._land(key, flight)
+                yield chunk
+        except GeneratorExit:
+            if flight.resp is None:
+                flight.abandoned = True
+            raise
+        except BaseException as e:
+            if flight.resp is None:
+                flight.error = e
+            raise
+        finally:
+            if flight.resp is None and flight.error is None:
+                flight.error = RuntimeError("stream ended before done")
+            self._land(key, flight)
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
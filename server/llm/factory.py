@@ -1,12 +1,105 @@
-from .ollama_provider import OllamaProvider
+from .ollama_provider import OllamaProvider, AsyncOllamaProvider
+from .cache import CachedProvider
+from .scheduler import ScheduledProvider
+from .pool import PooledOllamaProvider
+from .routing import RoutedProvider
 
-def build_provider(cfg:dict):
+def build_provider(cfg:dict, *, asynchronous: bool = False):
+    # asynchronous=True returns a provider with achat()/achat_stream() instead of chat()/chat_stream()
     llm = cfg['llm']
+    pool = llm.get('pool') or {}
     if llm.get('provider') == 'ollama':
-        return OllamaProvider(
-            base_url=llm ['base_url'],
-            model = llm['model'],
-            time_out_s= int(llm.get('time_out_s',120)),
-            temperature = float(llm.get('temperature',0.3))
-        )
+        timeout = int(llm.get('timeout_s', llm.get('time_out_s', 120)))
+        endpoints = [e['base_url'] if isinstance(e, dict) else e for e in (llm.get('endpoints') or [])]
+        if asynchronous:
+            # no async pool or routing yet: the async provider talks to base_url (or the first endpoint)
+            if llm.get('tiers'):
+                raise ValueError("llm.tiers is not supported with asynchronous=True (no async routing)")
+            if not (llm.get('base_url') or endpoints):
+                raise ValueError("llm.base_url or llm.endpoints is required")
+            return AsyncOllamaProvider(
+                base_url=llm.get('base_url') or endpoints[0],
+                model=llm['model'],
+                time_out_s=timeout,
+                temperature=float(llm.get('temperature',0.3)),
+                max_connections=int(pool.get('maxsize', 8)),
+                max_keepalive=int(pool.get('maxsize', 8)),
+                keepalive_s=float(pool.get('keepalive_s', 30)),
+                keep_alive=llm.get('keep_alive'),
+                num_ctx=llm.get('num_ctx'),
+            )
+        tiers = llm.get('tiers') or {}
+        if tiers:
+            # one provider per tier (tier keys override the llm defaults: model, temperature, num_ctx, endpoints...)
+            providers = {name: _build_base(_tier_cfg(llm, t or {})) for name, t in tiers.items()}
+            default_tier = llm.get('default_tier') or next(iter(providers))
+            provider = RoutedProvider(providers, dict(llm.get('routes') or {}), default_tier)
+        else:
+            provider = _build_base(llm)
+        # cache outermost: a cache hit never waits for a scheduler slot
+        return _with_cache(_with_scheduler(provider, llm.get('scheduler') or {}), llm.get('cache') or {})
     raise ValueError(f"Unknown provider: {llm.get('provider')}")
+
+def _tier_cfg(llm: dict, tier: dict) -> dict:
+    merged = {**llm, **tier}
+    if 'base_url' in tier and 'endpoints' not in tier:
+        merged['endpoints'] = None # the tier names its own host
+    return merged
+
+def _build_base(llm: dict):
+    # one ollama host (base_url) or a balanced pool (endpoints)
+    pool = llm.get('pool') or {}
+    timeout = int(llm.get('timeout_s', llm.get('time_out_s', 120)))
+    endpoints = [e['base_url'] if isinstance(e, dict) else e for e in (llm.get('endpoints') or [])]
+    if endpoints:
+        # several ollama hosts: balanced, health-checked, failover on timeout
+        health = llm.get('health') or {}
+        provider = PooledOllamaProvider(
+            endpoints,
+            model=llm['model'],
+            time_out_s=timeout,
+            temperature=float(llm.get('temperature',0.3)),
+            probe_interval_s=float(health.get('interval_s', 15)),
+            probe_timeout_s=float(health.get('timeout_s', 2)),
+            pool_connections=int(pool.get('connections', 4)),
+            pool_maxsize=int(pool.get('maxsize', 8)),
+            max_retries=int(pool.get('retries', 0)),
+            keep_alive=llm.get('keep_alive'),
+            num_ctx=llm.get('num_ctx'),
+        )
+        provider.start_health_checks()
+        return provider
+    return OllamaProvider(
+        base_url=llm ['base_url'],
+        model = llm['model'],
+        time_out_s= timeout,
+        temperature = float(llm.get('temperature',0.3)),
+        pool_connections=int(pool.get('connections', 4)),
+        pool_maxsize=int(pool.get('maxsize', 8)),
+        max_retries=int(pool.get('retries', 0)),
+        keep_alive=llm.get('keep_alive'),
+        num_ctx=llm.get('num_ctx'),
+    )
+
+def _with_scheduler(provider, sched_cfg: dict):
+    if not sched_cfg.get('enabled', False):
+        return provider
+    bg = sched_cfg.get('background_max_in_flight')
+    return ScheduledProvider(
+        provider,
+        max_in_flight=int(sched_cfg.get('max_in_flight', 2)),
+        background_max_in_flight=None if bg is None else int(bg),
+        deadlines=dict(sched_cfg.get('deadlines_s') or {}),
+    )
+
+def _with_cache(provider, cache_cfg: dict):
+    if not cache_cfg.get('enabled', False):
+        return provider
+    ttl = cache_cfg.get('ttl_s', 86400)
+    return CachedProvider(
+        provider,
+        max_entries=int(cache_cfg.get('max_entries', 256)),
+        ttl_s=None if ttl is None else float(ttl),
+        disk_dir=cache_cfg.get('dir'),
+        max_temperature=float(cache_cfg.get('max_temperature', 0.0)),
+    )
@@ -0,0 +1,114 @@
+# server/llm/json_output.py
+# schema-constrained JSON answers (ollama `format`), read from the stream and cut off as soon as the object closes
+from __future__ import annotations
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .base import LLMProvider, LLMResponse, Message
+
+class JsonOutputError(ValueError):
+    """the answer was no valid object for the schema; text is what the model produced"""
+    def __init__(self, msg: str, text: str = ""):
+        super().__init__(msg)
+        self.text = text
+
+class JsonObjectDetector:
+    """
+    Incremental scanner for the first top-level {...}: tracks string / escape state and brace depth,
+    so braces inside strings don't count. feed() returns the object text once it is complete.
+    """
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._started = False
+        self.seen: List[str] = []  # everything fed so far, for error reporting
+        self.text: Optional[str] = None  # the complete object, once seen
+
+    def feed(self, piece: str) -> Optional[str]:
+        if self.text is not None:
+            return self.text
+        self.seen.append(piece)
+        begin = 0
+        for i, ch in enumerate(piece):
+            if not self._started:
+                if ch != "{":
+                    continue # constrained output starts at "{", this only skips leading whitespace / noise
+                self._started = True
+                begin = i
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buf.append(piece[begin:i + 1])
+                    self.text = "".join(self._buf)
+                    return self.text
+        if self._started:
+            self._buf.append(piece[begin:])
+        return None
+
+def validate(data: Any, schema: Dict[str, Any]) -> None:
+    """the subset of JSON schema we send: object with typed properties + required keys"""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    types = {"string": str, "integer": int, "number": (int, float), "boolean": bool, "array": list, "object": dict}
+    for key in schema.get("required", []):
+        if key not in data:
+            raise ValueError(f"missing key {key!r}")
+    for key, spec in (schema.get("properties") or {}).items():
+        t = types.get(spec.get("type", ""))
+        if key in data and t is not None and not isinstance(data[key], t):
+            raise ValueError(f"{key!r} should be {spec['type']}")
+
+def _decode(text: Optional[str], det: JsonObjectDetector, schema: Dict[str, Any]) -> Dict[str, Any]:
+    if text is None:
+        raise JsonOutputError("answer ended before the JSON object was complete", "".join(det.seen))
+    try:
+        data = json.loads(text)
+        validate(data, schema)
+    except ValueError as e:
+        raise JsonOutputError(str(e), text) from e
+    return data
+
+def chat_json(provider: LLMProvider, messages: List[Message], schema: Dict[str, Any], *,
+              temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], LLMResponse]:
+    """
+    One call, decoded against `schema`. The stream is closed right after the closing brace, which makes
+    ollama stop generating (constrained decoding tends to pad the object with whitespace up to num_predict).
+    Raises JsonOutputError (a ValueError, carrying the text) if the answer is no valid object for the schema.
+    """
+    start = time.perf_counter()
+    stream = getattr(provider, "chat_stream", None)
+    if stream is None:
+        resp = provider.chat(messages, temperature=temperature, max_tokens=max_tokens, format=schema)
+        det = JsonObjectDetector()
+        return _decode(det.feed(resp.content or ""), det, schema), resp
+
+    det = JsonObjectDetector()
+    raw: Dict[str, Any] = {}
+    gen = stream(messages, temperature=temperature, max_tokens=max_tokens, format=schema)
+    try:
+        for chunk in gen:
+            if chunk.content and det.feed(chunk.content) is not None:
+                raw["stopped_early"] = not chunk.done
+            if chunk.done:
+                raw.update(chunk.raw or {})
+            if chunk.done or det.text is not None:
+                break
+    finally:
+        gen.close() # closing the stream closes the HTTP response: generation stops server-side
+    raw["total_s"] = time.perf_counter() - start
+    data = _decode(det.text, det, schema)
+    return data, LLMResponse(content=det.text, raw=raw)
@@ -1,25 +1,152 @@
+import json
 import requests 
-from typing import List, Optional, Dict, Any
-from .base import LLMResponse, Message
+from requests.adapters import HTTPAdapter
+from typing import List, Optional, Dict, Any, Iterator, AsyncIterator
+from .base import LLMResponse, LLMChunk, Message
+from server.tracing import span, record_ollama
+
+def _chat_payload(model: str, default_temp: float, messages: List[Message], temperature: Optional[float], max_tokens: Optional[int], stream: bool,
+                  keep_alive: Optional[str] = None, num_ctx: Optional[int] = None, format: Any = None) -> Dict[str, Any]:
+    temp = default_temp if temperature is None else temperature
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "stream": stream,
+        "options": {"temperature": temp},
+    }
+    if max_tokens is not None:
+        payload["options"]["num_predict"] = max_tokens
+    # keep_alive: how long ollama keeps the model (and its KV cache) loaded after this call, e.g. "30m"
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    # a fixed context size: if ollama has to shift the context, the cached prompt prefix is lost
+    if num_ctx is not None:
+        payload["options"]["num_ctx"] = num_ctx
+    # "json" or a JSON schema: ollama constrains decoding to it
+    if format is not None:
+        payload["format"] = format
+    return payload
+
+def _parse_line(line) -> Optional[LLMChunk]:
+    # ollama answers with NDJSON: one json object per line, the last one has "done": true + stats
+    if not line:
+        return None
+    data = json.loads(line)
+    if data.get("error"):
+        raise RuntimeError(f"ollama error: {data['error']}")
+    done = bool(data.get("done"))
+    content = (data.get("message") or {}).get("content", "")
+    return LLMChunk(content=content, done=done, raw=data if done else None)
 
 class OllamaProvider:
-    def __init__(self, base_url:str, model:str, time_out_s: int = 120, temperature: float=0.2):
+    def __init__(self, base_url:str, model:str, time_out_s: int = 120, temperature: float=0.2,
+                 pool_connections: int = 4, pool_maxsize: int = 8, max_retries: int = 0,
+                 keep_alive: Optional[str] = None, num_ctx: Optional[int] = None):
         self.base_url = base_url.rstrip('/')
         self.model = model
         self.timeout_s = time_out_s
         self.temperature =temperature
-    def chat(self, messages: List[Message], *, temperature: Optional[float]=None, max_tokens: Optional[int]=None) -> LLMResponse:
-        temp = self.temperature if temperature is None else temperature
-        payload: Dict[str, Any] = {
-            "model": self.model,
-            "messages": messages,
-            "stream": False,
-            "options": {"temperature": temp},
-        }
-        if max_tokens is not None:
-            payload["options"]["num_predict"] = max_tokens
-
-        r = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout_s)
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        # one keep-alive session per provider, so every call reuses an open TCP connection
+        # pool_maxsize = how many connections to the same ollama host can be open in parallel
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def chat(self, messages: List[Message], *, temperature: Optional[float]=None, max_tokens: Optional[int]=None,
+             format: Any = None) -> LLMResponse:
+        payload = _chat_payload(self.model, self.temperature, messages, temperature, max_tokens, stream=False,
+                                keep_alive=self.keep_alive, num_ctx=self.num_ctx, format=format)
+        with span("ollama.chat", model=self.model) as s:
+            r = self.session.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout_s)
+            r.raise_for_status()
+            data = r.json()
+            record_ollama(data, s)
+        return LLMResponse(content=data["message"]["content"], raw=data)
+
+    def chat_stream(self, messages: List[Message], *, temperature: Optional[float]=None, max_tokens: Optional[int]=None,
+                    format: Any = None) -> Iterator[LLMChunk]:
+        payload = _chat_payload(self.model, self.temperature, messages, temperature, max_tokens, stream=True,
+                                keep_alive=self.keep_alive, num_ctx=self.num_ctx, format=format)
+        # closing the generator early closes the connection, which makes ollama stop generating
+        with span("ollama.chat_stream", model=self.model) as s, \
+                self.session.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout_s, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                chunk = _parse_line(line)
+                if chunk is None:
+                    continue
+                if chunk.done:
+                    record_ollama(chunk.raw, s)
+                # the span is current only while this generator runs, not in the consumer between chunks
+                s.suspend()
+                yield chunk
+                s.resume()
+                if chunk.done:
+                    return
+
+class AsyncOllamaProvider:
+    """
+    asyncio version of OllamaProvider: many achat() calls can run at once on one event loop,
+    sharing a bounded pool of keep-alive connections. Needs `pip install httpx`.
+    """
+    def __init__(self, base_url:str, model:str, time_out_s: int = 120, temperature: float=0.2,
+                 max_connections: int = 8, max_keepalive: int = 8, keepalive_s: float = 30.0,
+                 keep_alive: Optional[str] = None, num_ctx: Optional[int] = None):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout_s = time_out_s
+        self.temperature = temperature
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_s = keepalive_s
+        self._client = None
+
+    def _get_client(self):
+        # created lazily so the client binds to the event loop that actually uses it
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_s,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_s,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def achat(self, messages: List[Message], *, temperature: Optional[float]=None, max_tokens: Optional[int]=None,
+                    format: Any = None) -> LLMResponse:
+        payload = _chat_payload(self.model, self.temperature, messages, temperature, max_tokens, stream=False,
+                                keep_alive=self.keep_alive, num_ctx=self.num_ctx, format=format)
+        r = await self._get_client().post(f"{self.base_url}/api/chat", json=payload)
         r.raise_for_status()
         data = r.json()
-        return LLMResponse(content=data["message"]["content"], raw=data)
\ No newline at end of file
+        return LLMResponse(content=data["message"]["content"], raw=data)
+
+    async def achat_stream(self, messages: List[Message], *, temperature: Optional[float]=None, max_tokens: Optional[int]=None,
+                           format: Any = None) -> AsyncIterator[LLMChunk]:
+        payload = _chat_payload(self.model, self.temperature, messages, temperature, max_tokens, stream=True,
+                                keep_alive=self.keep_alive, num_ctx=self.num_ctx, format=format)
+        async with self._get_client().stream("POST", f"{self.base_url}/api/chat", json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                chunk = _parse_line(line)
+                if chunk is None:
+                    continue
+                yield chunk
+                if chunk.done:
+                    return
@@ -0,0 +1,184 @@
+# server/llm/pool.py
+# several ollama hosts behind one LLMProvider: least-outstanding balancing, /api/tags health probes, failover
+from __future__ import annotations
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import requests
+
+from .base import LLMChunk, LLMResponse, Message
+from .ollama_provider import OllamaProvider
+from server.tracing import current_span
+
+def _model_key(name: str) -> str:
+    # ollama lists "llama3" as "llama3:latest"
+    return name if ":" in name else f"{name}:latest"
+
+@dataclass
+class Endpoint:
+    provider: OllamaProvider
+    outstanding: int = 0
+    healthy: bool = True
+    models: Optional[Set[str]] = None  # None until the first successful probe: assume it has everything
+    failures: int = 0
+    last_error: str = ""
+    checked_at: float = 0.0
+    served: int = 0
+
+    @property
+    def base_url(self) -> str:
+        return self.provider.base_url
+
+    def has(self, model: str) -> bool:
+        return self.models is None or _model_key(model) in self.models
+
+class PooledOllamaProvider:
+    """
+    One OllamaProvider (own keep-alive session) per base_url. Each call goes to the healthy endpoint that
+    serves the model and has the fewest calls in flight. A timeout / connection error / "model not found"
+    marks that endpoint and the call is retried on the next one (a stream only until its first chunk).
+    A daemon thread probes GET /api/tags every probe_interval_s to bring endpoints back and learn their models.
+    """
+    def __init__(self, base_urls: List[str], model: str, time_out_s: int = 120, temperature: float = 0.2,
+                 probe_interval_s: float = 15.0, probe_timeout_s: float = 2.0, **provider_kwargs):
+        if not base_urls:
+            raise ValueError("PooledOllamaProvider needs at least one endpoint")
+        self.model = model
+        self.temperature = temperature
+        self.probe_interval_s = probe_interval_s
+        self.probe_timeout_s = probe_timeout_s
+        self.endpoints = [Endpoint(OllamaProvider(u, model, time_out_s=time_out_s, temperature=temperature, **provider_kwargs))
+                          for u in base_urls]
+        self._lock = threading.Lock()
+        self._rr = itertools.count()  # tie breaker, so idle endpoints take turns
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- health ----
+    def probe(self, ep: Endpoint) -> bool:
+        try:
+            r = ep.provider.session.get(f"{ep.base_url}/api/tags", timeout=self.probe_timeout_s)
+            r.raise_for_status()
+            models = {_model_key(m.get("name") or m.get("model", "")) for m in r.json().get("models", [])}
+        except (requests.RequestException, ValueError) as e:
+            self._mark_down(ep, e)
+            return False
+        with self._lock:
+            ep.models = models
+            ep.healthy = True
+            ep.failures = 0
+            ep.checked_at = time.time()
+        return True
+
+    def probe_all(self) -> None:
+        for ep in self.endpoints:
+            self.probe(ep)
+
+    def start_health_checks(self) -> None:
+        if self._thread is not None:
+            return
+        def loop():
+            while not self._stop.is_set():
+                self.probe_all()
+                self._stop.wait(self.probe_interval_s)
+        self._thread = threading.Thread(target=loop, name="ollama-health", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        for ep in self.endpoints:
+            ep.provider.close()
+
+    def _mark_down(self, ep: Endpoint, err: Exception) -> None:
+        with self._lock:
+            ep.healthy = False
+            ep.failures += 1
+            ep.last_error = f"{type(err).__name__}: {err}"
+            ep.checked_at = time.time()
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [{"base_url": ep.base_url, "healthy": ep.healthy, "outstanding": ep.outstanding, "served": ep.served,
+                     "failures": ep.failures, "models": sorted(ep.models) if ep.models is not None else None,
+                     "last_error": ep.last_error} for ep in self.endpoints]
+
+    # ---- balancing ----
+    def _pick(self, tried: Set[int]) -> Optional[Endpoint]:
+        with self._lock:
+            cands = [(i, ep) for i, ep in enumerate(self.endpoints) if i not in tried and ep.has(self.model)]
+            up = [c for c in cands if c[1].healthy]
+            # nothing known to be up: try the rest anyway rather than fail without a request
+            pool = up or cands
+            if not pool:
+                return None
+            start = next(self._rr)
+            n = len(self.endpoints)
+            i, ep = min(pool, key=lambda c: (c[1].outstanding, (c[0] - start) % n))
+            ep.outstanding += 1
+            tried.add(i)
+            return ep
+
+    def _done(self, ep: Endpoint, ok: bool) -> None:
+        with self._lock:
+            ep.outstanding -= 1
+            if ok:
+                ep.served += 1
+                ep.healthy = True
+
+    def _failover(self, ep: Endpoint, e: Exception) -> bool:
+        """True if the call should move to another endpoint"""
+        if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+            self._mark_down(ep, e)
+            return True
+        if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 404:
+            # ollama answers 404 for a model it doesn't have
+            with self._lock:
+                ep.models = (ep.models or set()) - {_model_key(self.model)}
+            return True
+        return False
+
+    # ---- LLMProvider ----
+    def chat(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+             format: Any = None) -> LLMResponse:
+        tried: Set[int] = set()
+        last: Optional[Exception] = None
+        while (ep := self._pick(tried)) is not None:
+            try:
+                resp = ep.provider.chat(messages, temperature=temperature, max_tokens=max_tokens, format=format)
+            except Exception as e:
+                self._done(ep, False)
+                if not self._failover(ep, e):
+                    raise
+                last = e
+                continue
+            self._done(ep, True)
+            s = current_span()
+            if s is not None:
+                s.set(endpoint=ep.base_url, attempts=len(tried))
+            return resp
+        raise RuntimeError(f"no ollama endpoint could serve {self.model}") from last
+
+    def chat_stream(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                    format: Any = None) -> Iterator[LLMChunk]:
+        tried: Set[int] = set()
+        last: Optional[Exception] = None
+        while (ep := self._pick(tried)) is not None:
+            started = False
+            ok = False
+            try:
+                for chunk in ep.provider.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, format=format):
+                    started = True
+                    yield chunk
+                ok = True
+                return
+            except Exception as e:
+                # once tokens reached the caller, a retry would repeat them: only fail over before that
+                if started or not self._failover(ep, e):
+                    raise
+                last = e
+            finally:
+                self._done(ep, ok)
+        raise RuntimeError(f"no ollama endpoint could serve {self.model}") from last
@@ -0,0 +1,87 @@
+# server/llm/routing.py
+# task-based model routing: agents tag their calls (qa / summarize / extract / draft / edit),
+# RoutedProvider sends each task to the provider of its tier (e.g. a 3B model for extraction, 8B for writing)
+from __future__ import annotations
+import contextvars
+import functools
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .base import LLMChunk, LLMProvider, LLMResponse, Message
+
+QA = "qa"
+SUMMARIZE = "summarize"
+EXTRACT = "extract"
+DRAFT = "draft"
+EDIT = "edit"
+TASKS = (QA, SUMMARIZE, EXTRACT, DRAFT, EDIT)
+
+_task: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_task", default=None)
+
+@contextmanager
+def task(name: str):
+    token = _task.set(name)
+    try:
+        yield
+    finally:
+        _task.reset(token)
+
+def current_task() -> Optional[str]:
+    return _task.get()
+
+def llm_task(name: str) -> Callable:
+    """decorator: LLM calls made inside the function are tagged with this task type"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with task(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+class RoutedProvider:
+    """
+    tiers: tier name -> provider, routes: task -> tier name. Untagged calls and tasks without a route
+    use default_tier. model / temperature follow the current task, so the response cache above this
+    never mixes answers of different models.
+    """
+    def __init__(self, tiers: Dict[str, LLMProvider], routes: Dict[str, str], default_tier: str):
+        if default_tier not in tiers:
+            raise ValueError(f"default tier {default_tier!r} is not defined")
+        unknown = {t for t in routes.values() if t not in tiers}
+        if unknown:
+            raise ValueError(f"routes point to undefined tiers: {sorted(unknown)}")
+        self.tiers = tiers
+        self.routes = dict(routes)
+        self.default_tier = default_tier
+
+    def tier_for(self, task_name: Optional[str]) -> str:
+        return self.routes.get(task_name or "", self.default_tier)
+
+    def provider(self) -> LLMProvider:
+        return self.tiers[self.tier_for(current_task())]
+
+    @property
+    def model(self) -> str:
+        return getattr(self.provider(), "model", "")
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return getattr(self.provider(), "temperature", None)
+
+    def close(self) -> None:
+        for p in self.tiers.values():
+            close = getattr(p, "close", None)
+            if close is not None:
+                close()
+
+    def chat(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> LLMResponse:
+        return self.provider().chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+
+    def chat_stream(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> Iterator[LLMChunk]:
+        p = self.provider()
+        if not hasattr(p, "chat_stream"):
+            resp = p.chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+            yield LLMChunk(content=resp.content, done=True, raw=resp.raw)
+            return
+        yield from p.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
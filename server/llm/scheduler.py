@@ -0,0 +1,142 @@
+# server/llm/scheduler.py
+# admission control in front of one ollama: bounded in-flight calls, interactive before background
+from __future__ import annotations
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+from .base import LLMChunk, LLMProvider, LLMResponse, Message
+from server.tracing import REGISTRY, current_span
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)  # dispatch order
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(cls: str):
+    """with priority(BACKGROUND): ... every LLM call inside (same thread / copied context) is queued as background"""
+    if cls not in PRIORITIES:
+        raise ValueError(f"unknown priority {cls!r}")
+    token = _priority.set(cls)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+class QueueTimeout(TimeoutError):
+    """the call waited longer than its class deadline for a free slot"""
+
+class _Waiter:
+    __slots__ = ("cls", "event", "granted")
+
+    def __init__(self, cls: str):
+        self.cls = cls
+        self.event = threading.Event()
+        self.granted = False
+
+class ScheduledProvider:
+    """
+    At most max_in_flight calls reach the wrapped provider; the rest wait in one FIFO queue per priority.
+    A free slot always goes to the oldest interactive call first. Background calls may use at most
+    background_max_in_flight slots, so a running summary never occupies every slot (ollama can't preempt).
+    deadlines: max queue wait per class in seconds (None = wait as long as it takes), then QueueTimeout.
+    """
+    def __init__(self, inner: LLMProvider, max_in_flight: int = 2, background_max_in_flight: Optional[int] = None,
+                 deadlines: Optional[Dict[str, Optional[float]]] = None):
+        self.inner = inner
+        if max_in_flight < 2:
+            # one slot can't be split: a background summary would hold it and every user turn would wait behind it
+            raise ValueError("scheduler.max_in_flight must be at least 2 (one slot always stays free for interactive calls)")
+        self.max_in_flight = max_in_flight
+        bg = self.max_in_flight - 1 if background_max_in_flight is None else background_max_in_flight
+        self.background_max_in_flight = max(1, min(bg, self.max_in_flight - 1))
+        self.deadlines: Dict[str, Optional[float]] = {INTERACTIVE: None, BACKGROUND: 600.0, **(deadlines or {})}
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Waiter]] = {c: deque() for c in PRIORITIES}
+        self._running: Dict[str, int] = {c: 0 for c in PRIORITIES}
+        self.served: Dict[str, int] = {c: 0 for c in PRIORITIES}
+        self.timeouts: Dict[str, int] = {c: 0 for c in PRIORITIES}
+
+    @property
+    def model(self) -> str:
+        return getattr(self.inner, "model", "")
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return getattr(self.inner, "temperature", None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {c: {"running": self._running[c], "queued": len(self._queues[c]),
+                        "served": self.served[c], "timeouts": self.timeouts[c]} for c in PRIORITIES}
+
+    # ---- admission ----
+    def _free(self, cls: str) -> bool:
+        if sum(self._running.values()) >= self.max_in_flight:
+            return False
+        return cls == INTERACTIVE or self._running[BACKGROUND] < self.background_max_in_flight
+
+    def _dispatch(self) -> None:
+        # called with the lock held, whenever a slot frees up
+        for cls in PRIORITIES:
+            q = self._queues[cls]
+            while q and self._free(cls):
+                w = q.popleft()
+                w.granted = True
+                self._running[cls] += 1
+                w.event.set()
+
+    def _acquire(self, cls: str) -> float:
+        t0 = time.perf_counter()
+        w = _Waiter(cls)
+        with self._lock:
+            ahead = any(self._queues[c] for c in PRIORITIES[:PRIORITIES.index(cls) + 1])
+            if not ahead and self._free(cls):
+                self._running[cls] += 1
+                w.granted = True
+            else:
+                self._queues[cls].append(w)
+        if not w.granted and not w.event.wait(self.deadlines.get(cls)):
+            with self._lock:
+                if not w.granted: # the grant may have raced with the timeout
+                    self._queues[cls].remove(w)
+                    self.timeouts[cls] += 1
+                    raise QueueTimeout(f"{cls} LLM call waited more than {self.deadlines.get(cls)}s for a slot")
+        waited = time.perf_counter() - t0
+        REGISTRY.observe("llm_queue_wait_seconds", waited, {"priority": cls}, help="time an LLM call waited for a slot")
+        s = current_span()
+        if s is not None:
+            s.set(queue_wait_s=waited, priority=cls)
+        return waited
+
+    def _release(self, cls: str) -> None:
+        with self._lock:
+            self._running[cls] -= 1
+            self.served[cls] += 1
+            self._dispatch()
+
+    # ---- LLMProvider ----
+    def chat(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> LLMResponse:
+        cls = current_priority()
+        self._acquire(cls)
+        try:
+            return self.inner.chat(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+        finally:
+            self._release(cls)
+
+    def chat_stream(self, messages: List[Message], *, temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> Iterator[LLMChunk]:
+        cls = current_priority()
+        self._acquire(cls)
+        try:
+            # the slot is held until the stream is finished or closed
+            yield from self.inner.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+        finally:
+            self._release(cls)
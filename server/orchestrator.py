@@ -1,15 +1,18 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
 import re
 
 from agents.qa_agent import QAAgent
-from agents.email_agent import EmailAgent
 from agents.base import AgentResult
-from server.llm.base import LLMProvider
+from server.llm.base import LLMProvider, TokenCallback
 from tools.email.base import EmailProvider
+from tools.email.draft_sync import DraftSyncQueue
+from server.prefetch import InboxPrefetcher
+from server.journal import SessionJournal
 from server.state import SessionState, DraftState
-from server.parser.router import parse_user_text
+from server.parser.classifier import classify
+from server.tracing import current_span, span, traced
 from server.parser.schema import Action
 from server.state import DraftState
 
@@ -111,77 +114,146 @@ class Orchestrator:
     email_provider: EmailProvider
     profile: dict
     pending: Optional[dict] = None  # used to make sure to send the message
+    interactive: bool = True  # False when served over the network: never block on input() / VSCode
+    draft_sync: Optional[DraftSyncQueue] = None  # shared write-behind queue for drafts.update
+    prefetcher: Optional[InboxPrefetcher] = None  # background inbox summary, see start_prefetch()
+    email_options: Dict[str, Any] = field(default_factory=dict)  # extra EmailAgent kwargs (summary mode, caches...)
+    journal: Optional[SessionJournal] = None  # draft versions + pending gate on disk, replayed on startup
 
     def __post_init__(self):
-        self.agents: Dict[str, object] = {
-            "qa": QAAgent(self.llm_provider),
-            "email": EmailAgent(self.llm_provider, self.email_provider, self.profile),
-        }
+        # agents are created on first use: a QA-only session never builds EmailAgent (or the email provider)
+        self.agents: Dict[str, object] = {}
         self.session = SessionState() #session state
-
-    def handle_revise(self, mode: str, instruction: str = ""):
-        email_agent = self.agents["email"]
+        if self.draft_sync is None:
+            self.draft_sync = DraftSyncQueue(self.email_provider)
+        if self.journal is not None:
+            self.restore()
+
+    def restore(self) -> bool:
+        """replay the journal: open draft (every version) and the pending-send gate, no LLM / gmail call"""
+        with span("orchestrator.restore") as s:
+            d, pending = self.journal.load()
+            self.session.draft = d
+            self.pending = pending
+            s.set(records=self.journal.records, version=d.version if d else 0)
+        if d is not None and self.pending and self.pending.get("type") == "confirm_send":
+            # the last revision may not have reached gmail before the restart (only while it can still be sent:
+            # this is also the only case that needs the email provider at startup)
+            self._sync_draft(d)
+        return d is not None
+
+    def _set_draft(self, d: DraftState) -> None:
+        self.session.draft = d
+        if self.journal is not None:
+            self.journal.new_draft(d)
+
+    def _set_pending(self, pending: Optional[dict]) -> None:
+        self.pending = pending
+        if self.journal is not None:
+            self.journal.pending(pending)
+
+    def _commit_version(self, d: DraftState, body: str, source: str) -> None:
+        base = d.version
+        d.commit(body, source)
+        if self.journal is not None:
+            self.journal.version(d, base)
+        self._sync_draft(d)
+
+    def _agent(self, key: str):
+        agent = self.agents.get(key)
+        if agent is None:
+            if key == "email":
+                from agents.email_agent import EmailAgent
+                agent = EmailAgent(self.llm_provider, self.email_provider, self.profile, **self.email_options)
+            else:
+                agent = QAAgent(self.llm_provider)
+            self.agents[key] = agent
+        return agent
+
+    def start_prefetch(self, interval_s: float = 300, days: int = 7, limit: Optional[int] = None) -> InboxPrefetcher:
+        # summarize the inbox in the background so "总结我的收件箱" can answer right away
+        if self.prefetcher is None:
+            self.prefetcher = InboxPrefetcher(lambda: self._agent("email"), interval_s=interval_s, days=days, limit=limit)
+        self.prefetcher.start()
+        return self.prefetcher
+
+    def _sync_draft(self, d: DraftState) -> None:
+        # queued, not uploaded: rapid revisions collapse into one drafts.update
+        if d.draft_id:
+            self.draft_sync.submit(d.draft_id, d.to or "", d.subject or "", d.body or "")
+
+    def _ask(self, prompt: str) -> str:
+        return input(prompt).strip() if self.interactive else ""
+
+    @traced("orchestrator.handle_revise")
+    def handle_revise(self, mode: str, instruction: str = "") -> str:
+        # returns a status line for the user
+        email_agent = self._agent("email")
         d = self.session.draft
-        if d and d.draft_id:
-            self.email_provider.update_draft(d.draft_id, d.to, d.subject, d.body)
-
         if not d or not d.body:
-            print("没有可修改的草稿。先起草一封邮件。")
-            return
+            return "没有可修改的草稿。先起草一封邮件。"
 
         mode = (mode or "").strip().lower()
         
 
         # 1) manual (VSCode)
         if mode == "manual":
+            if not self.interactive:
+                return "manual 模式需要本地 VSCode，当前会话不支持。请用 revise edit <instruction>。"
             new_body = manual_edit_vscode(d.body)
             if new_body is None:
-                print("未修改（或已取消）。")
-                return
-            d.body = new_body
-            d.version += 1
-            d.source = "human" if d.source == "llm" else "mixed"
-            if d and d.draft_id:
-                self.email_provider.update_draft(d.draft_id, d.to, d.subject, d.body)
-            print(f" 草稿已手动更新（v{d.version}）")
-            return
+                return "未修改（或已取消）。"
+            self._commit_version(d, new_body, "human" if d.source == "llm" else "mixed")
+            return f" 草稿已手动更新（v{d.version}，source={d.source}）"
 
         # 2) edit (LLM modifies current)
         if mode in ("edit", "edit_draft"):
             if not instruction.strip():
-                instruction = input("请输入修改指令（例如：更正式、更短、删第二段...）： ").strip()
+                instruction = self._ask("请输入修改指令（例如：更正式、更短、删第二段...）： ")
                 if not instruction:
-                    print("未提供修改指令。")
-                    return
-            d.body = email_agent.edit_draft_body(
+                    return "未提供修改指令。"
+            new_body = email_agent.edit_draft_body(
                 current_body=d.body,
                 instruction=instruction,
                 to=d.to,
                 subject=d.subject,
+                draft_id=d.draft_id,
             )
-            d.version += 1
-            d.source = "llm" if d.source == "llm" else "mixed"
-            print(f"✔ 草稿已由 LLM 修改（v{d.version}）")
-            return
+            self._commit_version(d, new_body, "llm" if d.source == "llm" else "mixed")
+            return f"✔ 草稿已由 LLM 修改（v{d.version}，source={d.source}）"
 
         # 3) regenerate (LLM rewrites)
         if mode in ("regenerate", "rewrite", "regen"):
             if not instruction.strip():
-                instruction = input("请输入重写要求（例如：更简短、更正式、强调我搞错deadline...）： ").strip()
+                instruction = self._ask("请输入重写要求（例如：更简短、更正式、强调我搞错deadline...）： ")
                 if not instruction:
                     instruction = "Rewrite the email with the same intent, concise and polite."
-            d.body = email_agent.regenerate_body(
+            new_body = email_agent.regenerate_body(
                 instruction=instruction,
                 to=d.to,
                 subject=d.subject,
                 reference_body=d.body,
+                draft_id=d.draft_id,
             )
-            d.version += 1
-            d.source = "llm" if d.source == "llm" else "mixed"
-            print(f"✔ 草稿已重写（v{d.version}）")
-            return
+            self._commit_version(d, new_body, "llm" if d.source == "llm" else "mixed")
+            return f"✔ 草稿已重写（v{d.version}，source={d.source}）"
 
-        print(f"不支持的 revise mode: {mode}")
+        return f"不支持的 revise mode: {mode}"
+
+    def handle_undo(self, version: Optional[int] = None) -> str:
+        # every version is kept in memory: no LLM call, the restored body is synced like a revision
+        d = self.session.draft
+        if not d or not d.body:
+            return "没有可撤销的草稿。"
+        target = d.version - 1 if version is None else version
+        if target < 1:
+            return f"已经是最早的版本（v{d.version}）。"
+        if not d.restore(target):
+            return f"没有版本 v{target}（可用：v1–v{len(d.history)}）。"
+        if self.journal is not None:
+            self.journal.undo(d)
+        self._sync_draft(d)
+        return f"↩ 草稿已恢复到 v{d.version}（共 {len(d.history)} 个版本，source={d.source}）"
 
     def route(self, user_text: str) -> str:
         t = user_text.lower()
@@ -189,12 +261,14 @@ class Orchestrator:
             return "email"
         return "qa"
 
-    def handle(self, user_text: str) -> AgentResult:
+    @traced("orchestrator.handle")
+    def handle(self, user_text: str, on_token: Optional[TokenCallback] = None) -> AgentResult:
+        # on_token: if given, QA answers and inbox summaries are streamed token by token
         user_text = (user_text or "").strip()
 
         if self.pending and self.pending.get("type") == "confirm_send":
             low = user_text.lower().strip()
-            if low.startswith(("revise", "edit", "rewrite", "regenerate", "manual", "show")):
+            if low.startswith(("revise", "edit", "rewrite", "regenerate", "manual", "show", "undo", "撤销")) or low == "u":
                 #if following action, still email_agent mode
                 pass
             else:
@@ -202,13 +276,19 @@ class Orchestrator:
                     draft_id = self.pending["draft_id"]
                     to = self.pending["to"]
                     subject = self.pending["subject"]
-                    self.pending = None
+                    # the queued revision must reach gmail before sending, otherwise an old version goes out
+                    self.draft_sync.flush(draft_id)
+                    self._set_pending(None)
 
                     msg_id = self.email_provider.send_draft(draft_id)#send email
+                    # gmail deleted the draft: nothing left to revise or re-sync on restore
+                    self.session.draft = None
+                    if self.journal is not None:
+                        self.journal.sent()
                     return AgentResult(content=f" 已发送！(Message ID: {msg_id})\nTo: {to}\nSubject: {subject}")
 
                 if user_text.upper() in {"CANCEL", "NO", "N"}:
-                    self.pending = None
+                    self._set_pending(None)
                     return AgentResult(content=" 已取消发送（草稿仍保留在 Gmail Drafts）。")
 
                 return AgentResult(content=(
@@ -221,16 +301,13 @@ class Orchestrator:
         if user_text == "":
             return AgentResult(content="（请输入你的问题或指令，例如：总结我的收件箱 / 草拟邮件 ...）")
 
-        # 1) first parse, then route
-        cmd = parse_user_text(user_text)
-        
-
-        if cmd.action in {Action.REVISE, Action.SHOW, Action.SEND, Action.CANCEL, Action.HELP}:
-            key = "email"
-            agent = self.agents[key]
-        else:
-            key = self.route(user_text)
-            agent = self.agents[key]
+        # 1) first parse, then route (one precompiled pass: command, route, intents, to=/subject=/内容= fields)
+        with span("orchestrator.classify"):
+            c = classify(user_text)
+        cmd = c.command
+        key = c.route
+        current_span().set(route=key, action=cmd.action.value)
+        agent = self._agent(key)
 
         # 2) Email 分支
         if key == "email":
@@ -253,23 +330,37 @@ class Orchestrator:
             if cmd.action == Action.REVISE:
                 mode = cmd.args.get("mode", "edit")
                 instruction = cmd.args.get("instruction", "")
-                self.handle_revise(mode, instruction)
+                status = self.handle_revise(mode, instruction)
                 d = self.session.draft
-                return AgentResult(content=(
-                        f"✅ 草稿已更新（v{d.version}，source={d.source}）\n\n"
-                        f"{d.body}"
-                    ))
+                if not d or not d.body:
+                    return AgentResult(content=status)
+                return AgentResult(content=f"{status}\n\n{d.body}")
+
+            # ---- UNDO (back to any earlier version) ----
+            if cmd.action == Action.UNDO:
+                status = self.handle_undo(cmd.args.get("version"))
+                d = self.session.draft
+                if not d or not d.body:
+                    return AgentResult(content=status)
+                return AgentResult(content=f"{status}\n\n{d.body}")
             # 2.1 summarize inbox
-            if any(k in user_text for k in ["总结", "收件箱", "inbox", "最近", "最新"]):
-                return agent.summarize_inbox(limit=5)
+            if c.summarize:
+                limit = agent.inbox_limit
+                # the window the prefetcher summarizes (prefetch.days), so its result is actually used
+                days = self.prefetcher.days if self.prefetcher is not None else 7
+                if self.prefetcher is not None:
+                    ready = self.prefetcher.get(days=days, limit=limit, on_token=on_token)
+                    if ready is not None:
+                        return ready
+                return agent.summarize_inbox(days=days, limit=limit, on_token=on_token)
 
             # 2.2 drafting
             # support drafting to=... subject=... 内容=...
-            to = parse_kv(user_text, "to")
-            subject = parse_kv(user_text, "subject")
-            content = parse_kv(user_text, "内容") or parse_kv(user_text, "content")
+            to = c.to
+            subject = c.subject
+            content = c.content
 
-            want_draft = is_email_drafting_intent(user_text)
+            want_draft = c.draft_intent
             # strong formating, in case that guessing does not work
             if want_draft:
                 if to and subject:
@@ -286,21 +377,21 @@ class Orchestrator:
         #     draft_id=draft_id
         # )
         # -----------------------------
-                    self.session.draft = DraftState(
+                    self._set_draft(DraftState(
                         to=to,
                         subject=subject,
                         body=draft_result.content,
                         draft_id = draft_id,
                         version=1,
                         source="llm",
-                    )
+                    ))
                     
-                    self.pending = {
+                    self._set_pending({
                         "type": "confirm_send",
                         "draft_id": draft_id,
                         "to": to,
                         "subject": subject,
-                    }
+                    })
 
                     return AgentResult(content=(
                         " Gmail script created：\n\n"
@@ -309,15 +400,16 @@ class Orchestrator:
                         "revise manual\n"
                         "revise edit <instruction>\n"
                         "revise regenerate <instruction>\n"
+                        "undo [v<n>]\n"
                         "-show\n\n"
                         "CONFIRM SEND\n"
                         "CANCEL\n"
                     ))
                  # B) natural language processing
-                to_guess = to or extract_email(user_text)
+                to_guess = to or c.email
 
                 auto_text = user_text
-                if to_guess and "to=" not in user_text.lower():
+                if to_guess and not c.has_to_key:
                     auto_text = f"{user_text}\n\nRecipient email detected: {to_guess}"
 
                 (draft_result, draft_id, to2, subject2) = agent.draft_email_auto(
@@ -342,11 +434,11 @@ class Orchestrator:
                 # )
                 # -----------------------------
 
-                self.session.draft = DraftState(
+                self._set_draft(DraftState(
                     to=to2, subject=subject2, body=draft_result.content,
                     draft_id=draft_id, version=1, source="llm"
-                )
-                self.pending = {"type": "confirm_send", "draft_id": draft_id, "to": to2, "subject": subject2}
+                ))
+                self._set_pending({"type": "confirm_send", "draft_id": draft_id, "to": to2, "subject": subject2})
 
                 return AgentResult(content=(
                         " Gmail script created：\n\n"
@@ -356,6 +448,7 @@ class Orchestrator:
                         "revise manual\n"
                         "revise edit <instruction>\n"
                         "revise regenerate <instruction>\n"
+                        "undo [v<n>]\n"
                         "-show\n\n"
                         "CONFIRM SEND\n"
                         "CANCEL\n"
@@ -370,5 +463,5 @@ class Orchestrator:
             ))
 
         # 3) QA 分支
-        return agent.handle(user_text)
+        return agent.handle(user_text, on_token=on_token)
 
@@ -0,0 +1,116 @@
+# server/parser/classifier.py
+# one precompiled pass over the user text: command, route, summarize / draft intent and the key=value fields
+from __future__ import annotations
+import re
+from typing import Dict, Tuple
+
+from .router import parse_user_text
+from .schema import Action, Classification
+
+# keyword tables (same lists the orchestrator used to scan one by one)
+ROUTE_KEYWORDS = ["邮箱", "邮件", "收件箱", "inbox", "email", "mail", "draft", "草稿", "发送", "send"]
+SUMMARIZE_KEYWORDS = ["总结", "收件箱", "inbox", "最近", "最新"]  # matched case-sensitively
+DRAFT_KEYWORDS = ["draft", "草拟", "起草", "写封邮件", "写邮件", "发邮件", "email to", "send an email"]
+STRUCT_KEYWORDS = ["to=", "subject=", "content=", "内容="]
+CONTACT_KEYWORDS = ["email", "mail", "send", "发", "写", "问", "联系"]  # only count together with an email address
+KV_KEYS = ["to", "subject", "内容", "content"]
+EMAIL_ACTIONS = {Action.REVISE, Action.SHOW, Action.SEND, Action.CANCEL, Action.HELP, Action.UNDO}
+
+# role bits
+ROUTE, DRAFT, STRUCT, CONTACT, TO_KEY = 1, 2, 4, 8, 16
+
+def _build() -> Tuple[re.Pattern, Dict[str, Tuple[int, Tuple[str, ...], Tuple[str, ...]]]]:
+    literals = sorted(set(ROUTE_KEYWORDS + SUMMARIZE_KEYWORDS + DRAFT_KEYWORDS + STRUCT_KEYWORDS + CONTACT_KEYWORDS + KV_KEYS),
+                      key=len, reverse=True)
+    # at one position the lookahead reports only the longest literal; the shorter ones starting there
+    # are its prefixes, so each literal carries the roles of all its literal prefixes
+    info = {}
+    for w in literals:
+        prefixes = [p for p in literals if w.startswith(p)]
+        mask = 0
+        for bit, words in [(ROUTE, ROUTE_KEYWORDS), (DRAFT, DRAFT_KEYWORDS), (STRUCT, STRUCT_KEYWORDS), (CONTACT, CONTACT_KEYWORDS)]:
+            if any(p in words for p in prefixes):
+                mask |= bit
+        if "to=" in prefixes:
+            mask |= TO_KEY
+        summarize = tuple(p for p in prefixes if p in SUMMARIZE_KEYWORDS)
+        keys = tuple(p for p in prefixes if p in KV_KEYS)
+        info[w] = (mask, summarize, keys)
+    pattern = re.compile("(?=(" + "|".join(re.escape(w) for w in literals) + "))")
+    return pattern, info
+
+_SCAN, _INFO = _build()
+_KV_VALUE = re.compile(r"\s*=\s*(\"[^\"]*\"|[^\s]+)")
+
+def _kv_value(text: str, key: str, end: int) -> str | None:
+    m = _KV_VALUE.match(text, end)
+    if not m:
+        return None
+    val = m.group(1).strip()
+    if val.startswith('"') and val.endswith('"'):
+        return val[1:-1]
+    return val
+
+def classify(user_text: str) -> Classification:
+    text = (user_text or "").strip()
+    low = text.lower()
+    if len(low) != len(text):
+        # a few unicode characters change length when lowercased; offsets would not line up
+        return _classify_slow(text)
+
+    flags = 0
+    summarize = False
+    kv: Dict[str, str] = {}
+    for m in _SCAN.finditer(low):
+        mask, summary_words, keys = _INFO[m.group(1)]
+        flags |= mask
+        if summary_words and not summarize:
+            # the summary check is case-sensitive on the original text
+            pos = m.start()
+            summarize = any(text.startswith(w, pos) for w in summary_words)
+        for key in keys:
+            if key not in kv: # first occurrence that has a value wins, like re.search
+                val = _kv_value(text, key, m.start() + len(key))
+                if val is not None:
+                    kv[key] = val
+
+    command = parse_user_text(text)
+    c = Classification(
+        text=text,
+        command=command,
+        route="email" if flags & ROUTE or command.action in EMAIL_ACTIONS else "qa",
+        summarize=summarize,
+        draft_intent=bool(flags & (DRAFT | STRUCT)),
+        to=kv.get("to", ""),
+        subject=kv.get("subject", ""),
+        content=kv.get("内容") or kv.get("content", ""),
+        has_to_key=bool(flags & TO_KEY),
+    )
+    if not c.draft_intent and flags & CONTACT:
+        c.draft_intent = bool(c.email)
+    return c
+
+def _classify_slow(text: str) -> Classification:
+    # the original keyword-by-keyword checks
+    t = text.lower()
+    command = parse_user_text(text)
+    kv: Dict[str, str] = {}
+    for key in KV_KEYS:
+        m = re.search(rf"{key}\s*=\s*(\"[^\"]*\"|[^\s]+)", text, flags=re.IGNORECASE)
+        if m:
+            val = m.group(1).strip()
+            kv[key] = val[1:-1] if val.startswith('"') and val.endswith('"') else val
+    c = Classification(
+        text=text,
+        command=command,
+        route="email" if command.action in EMAIL_ACTIONS or any(k in t for k in ROUTE_KEYWORDS) else "qa",
+        summarize=any(k in text for k in SUMMARIZE_KEYWORDS),
+        draft_intent=any(k in t for k in DRAFT_KEYWORDS) or any(k in t for k in STRUCT_KEYWORDS),
+        to=kv.get("to", ""),
+        subject=kv.get("subject", ""),
+        content=kv.get("内容") or kv.get("content", ""),
+        has_to_key="to=" in t,
+    )
+    if not c.draft_intent and any(k in t for k in CONTACT_KEYWORDS):
+        c.draft_intent = bool(c.email)
+    return c
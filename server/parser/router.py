@@ -1,7 +1,10 @@
 # server/parser/router.py
 from __future__ import annotations
+import re
 from .schema import Action, ParsedCommand
 
+_UNDO_RE = re.compile(r"^(?:undo|u|撤销)(?:\s+v?(\d+))?$")
+
 def parse_user_text(user_text: str) -> ParsedCommand:
     t = (user_text or "").strip()
     if not t:
@@ -19,6 +22,11 @@ def parse_user_text(user_text: str) -> ParsedCommand:
     if low in ("send", "s"):
         return ParsedCommand(Action.SEND, {})
 
+    # undo / undo 2 / undo v2 / 撤销: back to the previous (or the given) draft version
+    m = _UNDO_RE.match(low)
+    if m:
+        return ParsedCommand(Action.UNDO, {"version": int(m.group(1)) if m.group(1) else None})
+
     # revise family
     tokens = t.split()
     head = tokens[0].lower()
@@ -2,6 +2,8 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from enum import Enum
+from functools import cached_property
+import re
 from typing import Any, Dict
 
 class Action(str, Enum):
@@ -11,9 +13,31 @@ class Action(str, Enum):
     SHOW = "SHOW"
     CANCEL = "CANCEL"
     HELP = "HELP"
+    UNDO = "UNDO"
 
 @dataclass
 class ParsedCommand:
     action: Action
     args: Dict[str, Any]
     confidence: float = 1.0
+
+_EMAIL_RE = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", flags=re.IGNORECASE)
+
+@dataclass
+class Classification:
+    # everything the orchestrator needs to know about one user turn (see parser/classifier.py)
+    text: str
+    command: ParsedCommand
+    route: str  # "email" | "qa"
+    summarize: bool  # inbox summary keywords
+    draft_intent: bool  # same as is_email_drafting_intent()
+    to: str = ""  # to=... / subject=... / 内容=... / content=... values, "" if absent
+    subject: str = ""
+    content: str = ""
+    has_to_key: bool = False  # literal "to=" in the text
+
+    @cached_property
+    def email(self) -> str:
+        """first email address in the text ("" if none); only computed when asked for"""
+        m = _EMAIL_RE.search(self.text)
+        return m.group(0) if m else ""
@@ -0,0 +1,83 @@
+# server/prefetch.py
+# background inbox prefetch: keeps a ready-made summarize_inbox result while the user is idle
+from __future__ import annotations
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from agents.base import AgentResult
+from server.llm.base import TokenCallback
+from server.llm.scheduler import BACKGROUND, priority
+
+class InboxPrefetcher:
+    """
+    Every interval_s: list the inbox and, if the set of messages changed, re-run the summary.
+    get() answers from that summary when the inbox still looks the same, otherwise summarizes the new listing.
+    """
+    def __init__(self, get_agent: Callable[[], object], interval_s: float = 300, days: int = 7, limit: Optional[int] = None):
+        self.get_agent = get_agent # called lazily, so the email stack is built in the background thread
+        self.interval_s = interval_s
+        self.days = days
+        self._limit = limit # None: whatever the agent summarizes (EmailAgent.inbox_limit)
+        self._fingerprint: Optional[Tuple[str, ...]] = None
+        self._result: Optional[AgentResult] = None
+        self.updated_at: float = 0.0
+        self._state_lock = threading.Lock()
+        self._compute_lock = threading.Lock() # one summary at a time, a request waits for a running refresh
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[Exception] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit if self._limit is not None else self.get_agent().inbox_limit
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="inbox-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with priority(BACKGROUND): # a user turn never waits behind this summary
+                    self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e # keep running; the user path falls back to a live summary
+            self._stop.wait(self.interval_s)
+
+    def _cached(self, fingerprint: Tuple[str, ...]) -> Optional[AgentResult]:
+        with self._state_lock:
+            if self._result is not None and self._fingerprint == fingerprint:
+                return self._result
+        return None
+
+    def _summarize(self, emails, on_token: Optional[TokenCallback] = None) -> AgentResult:
+        fingerprint = tuple(e.id for e in emails)
+        with self._compute_lock:
+            hit = self._cached(fingerprint) # may have been computed while we waited for the lock
+            if hit is not None:
+                return hit
+            result = self.get_agent().summarize_emails(emails, on_token=on_token)
+            with self._state_lock:
+                self._fingerprint = fingerprint
+                self._result = result
+                self.updated_at = time.time()
+            return result
+
+    def refresh(self) -> AgentResult:
+        emails = self.get_agent().mail.list_latest(limit=self.limit, days=self.days)
+        return self._summarize(emails)
+
+    def get(self, days: int, limit: int, on_token: Optional[TokenCallback] = None) -> Optional[AgentResult]:
+        """Prefetched summary if the inbox has not changed, a fresh one if it has; None for other parameters."""
+        if days != self.days or limit != self.limit:
+            return None
+        # the listing is cheap (mirror / batched metadata), the LLM summary is what we avoid
+        emails = self.get_agent().mail.list_latest(limit=self.limit, days=self.days)
+        return self._summarize(emails, on_token=on_token)
@@ -0,0 +1,255 @@
+# server/session_server.py
+# multi-session HTTP front end: every session gets its own Orchestrator (SessionState, DraftState, pending gate)
+from __future__ import annotations
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from agents.base import AgentResult
+from server.llm.base import TokenCallback
+from server.orchestrator import Orchestrator
+from server.journal import SessionJournal
+from server import tracing
+
+@dataclass
+class Session:
+    id: str
+    orch: Orchestrator
+    lock: threading.Lock = field(default_factory=threading.Lock) # one turn at a time per session
+    last_used: float = field(default_factory=time.monotonic)
+
+class SessionManager:
+    """
+    Table of live sessions. Different sessions run concurrently (one thread per HTTP request);
+    turns inside one session are serialized. Sessions idle for idle_ttl_s are dropped.
+    journal_dir: every session journals its draft + pending gate to <journal_dir>/<id>.jsonl; a session
+    that is not in memory (server restarted) is restored from its journal on its next request.
+    """
+    def __init__(self, make_orchestrator: Callable[[], Orchestrator], idle_ttl_s: float = 1800, max_sessions: int = 100,
+                 journal_dir: Optional[str] = None, journal_compact_every: int = 200):
+        self.make_orchestrator = make_orchestrator
+        self.idle_ttl_s = idle_ttl_s
+        self.max_sessions = max_sessions
+        self.journal_dir = Path(journal_dir) if journal_dir else None
+        self.journal_compact_every = journal_compact_every
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def create(self) -> str:
+        self.reap()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError("too many sessions")
+        s = Session(id=uuid.uuid4().hex, orch=self.make_orchestrator())
+        s.orch.journal = self._journal(s.id)
+        with self._lock:
+            self._sessions[s.id] = s
+        return s.id
+
+    def _journal(self, session_id: str) -> Optional[SessionJournal]:
+        if self.journal_dir is None:
+            return None
+        return SessionJournal(str(self.journal_dir / f"{session_id}.jsonl"), compact_every=self.journal_compact_every)
+
+    def _restore(self, session_id: str) -> Optional[Session]:
+        # journal of a session this process has not seen (restart): fresh if used within idle_ttl_s, else expired
+        path = self.journal_dir / f"{session_id}.jsonl" if self.journal_dir is not None else None
+        if path is None or not path.exists():
+            return None
+        if time.time() - path.stat().st_mtime > self.idle_ttl_s:
+            path.unlink(missing_ok=True)
+            return None
+        orch = self.make_orchestrator()
+        orch.journal = self._journal(session_id)
+        orch.restore()
+        return Session(id=session_id, orch=orch)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is not None:
+                s.last_used = time.monotonic()
+                return s
+        s = self._restore(session_id)
+        if s is None:
+            return None
+        with self._lock:
+            # a concurrent request may have restored it first
+            return self._sessions.setdefault(session_id, s)
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            s = self._sessions.pop(session_id, None)
+        if s is not None and s.orch.journal is not None:
+            s.orch.journal.remove()
+        return s is not None
+
+    def handle(self, session_id: str, text: str, on_token: Optional[TokenCallback] = None) -> AgentResult:
+        s = self.get(session_id)
+        if s is None:
+            raise KeyError(session_id)
+        with s.lock:
+            try:
+                return s.orch.handle(text, on_token=on_token)
+            finally:
+                s.last_used = time.monotonic()
+
+    def reap(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            # a session in the middle of a turn is never reaped
+            dead = [k for k, s in self._sessions.items() if now - s.last_used > self.idle_ttl_s and not s.lock.locked()]
+            gone = [self._sessions.pop(k) for k in dead]
+        for s in gone:
+            if s.orch.journal is not None:
+                s.orch.journal.remove()
+        return len(dead)
+
+    def start_reaper(self, interval_s: float = 60) -> None:
+        def loop():
+            while not self._stop.wait(interval_s):
+                self.reap()
+        self._reaper = threading.Thread(target=loop, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+_MESSAGES = re.compile(r"^/sessions/([0-9a-f]+)/messages$")
+_SESSION = re.compile(r"^/sessions/([0-9a-f]+)$")
+
+class _Handler(BaseHTTPRequestHandler):
+    manager: SessionManager
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, data: dict) -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if not n:
+            return {}
+        return json.loads(self.rfile.read(n).decode("utf-8"))
+
+    def _chunk(self, data: dict) -> None:
+        line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._json(200, {"status": "ok", "sessions": len(self.manager)})
+            return
+        if self.path == "/metrics":
+            payload = tracing.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        if self.path == "/metrics.json":
+            self._json(200, tracing.to_json())
+            return
+        self._json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        m = _SESSION.match(self.path)
+        if m and self.manager.close(m.group(1)):
+            self._json(200, {"closed": m.group(1)})
+            return
+        self._json(404, {"error": "unknown session"})
+
+    def do_POST(self):
+        if self.path == "/sessions":
+            try:
+                self._json(201, {"session_id": self.manager.create()})
+            except RuntimeError as e:
+                self._json(503, {"error": str(e)})
+            return
+
+        m = _MESSAGES.match(self.path)
+        if not m:
+            self._json(404, {"error": "not found"})
+            return
+        session_id = m.group(1)
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._json(400, {"error": "invalid json"})
+            return
+        if not isinstance(body, dict):
+            self._json(400, {"error": "invalid json"})
+            return
+        text = body.get("text", "")
+        if not isinstance(text, str):
+            self._json(400, {"error": "text must be a string"})
+            return
+        try:
+            known = self.manager.get(session_id) is not None
+        except Exception as e: # restoring its journal failed
+            self._json(500, {"error": str(e)})
+            return
+        if not known:
+            self._json(404, {"error": "unknown session"})
+            return
+
+        if not body.get("stream"):
+            try:
+                result = self.manager.handle(session_id, text)
+            except KeyError:
+                # reaped between get() and handle()
+                self._json(404, {"error": "unknown session"})
+                return
+            except Exception as e:
+                self._json(500, {"error": str(e)})
+                return
+            self._json(200, {"content": result.content, "ttft_s": result.ttft_s})
+            return
+
+        # stream: NDJSON over chunked encoding, {"token": ...} lines, then one {"done": true, ...} line
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        streamed = []
+
+        def on_token(tok: str):
+            streamed.append(tok)
+            self._chunk({"token": tok})
+
+        try:
+            result = self.manager.handle(session_id, text, on_token=on_token)
+            self._chunk({"done": True, "content": result.content, "streamed": bool(streamed), "ttft_s": result.ttft_s})
+        except Exception as e:
+            self._chunk({"done": True, "error": str(e)})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+def serve(manager: SessionManager, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    class Handler(_Handler):
+        pass
+    Handler.manager = manager
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
@@ -1,7 +1,7 @@
 # server/state.py  base
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Optional, Literal
+from dataclasses import dataclass, field
+from typing import List, Optional, Literal, Tuple
 
 @dataclass
 class DraftState:
@@ -11,8 +11,29 @@ class DraftState:
     version: int = 0
     source: Literal["llm", "human", "mixed"] = "llm"
     draft_id: Optional[str] = None
+    # (body, source) of every version, history[i] is v{i+1}: undo to any version is one list lookup
+    history: List[Tuple[str, str]] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.body is not None and not self.history:
+            self.history = [(self.body, self.source)]
+            self.version = 1
+
+    def commit(self, body: str, source: str) -> int:
+        # a revision is always a new version, also when it was made from an older (undone) one
+        self.history.append((body, source))
+        self.body, self.source = body, source
+        self.version = len(self.history)
+        return self.version
+
+    def restore(self, version: int) -> bool:
+        if not 1 <= version <= len(self.history):
+            return False
+        self.body, self.source = self.history[version - 1]
+        self.version = version
+        return True
 
 @dataclass
 class SessionState:
     draft: Optional[DraftState] = None
-    pending_send: bool = False #pending state
\ No newline at end of file
+    pending_send: bool = False #pending state
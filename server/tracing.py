@@ -0,0 +1,233 @@
+# server/tracing.py
+# lightweight spans + in-process latency histograms (orchestrator, agents, ollama, gmail)
+# dump with to_json() / to_prometheus(); nothing leaves the process unless you export it
+from __future__ import annotations
+import bisect
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# seconds; roughly log-spaced from "parser" to "slow local model"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """cumulative-bucket histogram (prometheus semantics), thread-safe"""
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation (what histogram_quantile would estimate at best)
+        with self._lock:
+            if not self.count:
+                return float("nan")
+            rank = q * self.count
+            seen = 0
+            for i, c in enumerate(self.counts):
+                seen += c
+                if seen >= rank and c:
+                    return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, total = [], 0
+            for c in self.counts:
+                total += c
+                cumulative.append(total)
+            return {"buckets": list(self.buckets), "cumulative": cumulative, "sum": self.sum, "count": self.count}
+
+class Registry:
+    def __init__(self, recent_spans: int = 200):
+        self._hists: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=recent_spans)
+        self.enabled = True
+
+    def histogram(self, name: str, labels: Optional[Dict[str, str]] = None, *,
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS, help: str = "") -> Histogram:
+        key = (name, tuple(sorted((labels or {}).items())))
+        h = self._hists.get(key)
+        if h is None:
+            with self._lock:
+                h = self._hists.get(key)
+                if h is None:
+                    h = self._hists[key] = Histogram(buckets)
+                    if help:
+                        self._help.setdefault(name, help)
+        return h
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None, **kw) -> None:
+        if self.enabled:
+            self.histogram(name, labels, **kw).observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+            self.recent.clear()
+
+    # ---- export ----
+    def _series(self) -> List[Tuple[Tuple[str, Labels], Histogram]]:
+        # copied under the lock: a request thread may add a histogram while /metrics is rendered
+        with self._lock:
+            return sorted(self._hists.items())
+
+    def to_json(self) -> Dict[str, Any]:
+        hists = []
+        for (name, labels), h in self._series():
+            snap = h.snapshot()
+            snap.update({"name": name, "labels": dict(labels),
+                         "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)})
+            hists.append(snap)
+        return {"histograms": hists, "recent_spans": list(self.recent)}
+
+    def to_prometheus(self) -> str:
+        out: List[str] = []
+        by_name: Dict[str, List[Tuple[Labels, Histogram]]] = {}
+        for (name, labels), h in self._series():
+            by_name.setdefault(name, []).append((labels, h))
+        for name, series in by_name.items():
+            if name in self._help:
+                out.append(f"# HELP {name} {self._help[name]}")
+            out.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                snap = h.snapshot()
+                for le, c in zip([*map(_fmt, snap["buckets"]), "+Inf"], snap["cumulative"]):
+                    out.append(f"{name}_bucket{_labels(labels, le=le)} {c}")
+                out.append(f"{name}_sum{_labels(labels)} {snap['sum']!r}")
+                out.append(f"{name}_count{_labels(labels)} {snap['count']}")
+        return "\n".join(out) + "\n"
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+def _labels(labels: Labels, **extra: str) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+REGISTRY = Registry()
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """
+    with span("gmail.list_latest") as s: ...; s.set(n=10)
+    duration goes to the span_seconds{span=...} histogram, finished spans to REGISTRY.recent
+    """
+    __slots__ = ("name", "attrs", "parent", "start", "duration", "error", "_token")
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.parent: Optional[str] = None
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _current.get()
+        self.parent = parent.name if parent is not None else None
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def suspend(self) -> None:
+        # a generator span around `yield`: the consumer's code between chunks is not inside it
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                pass
+            self._token = None
+
+    def resume(self) -> None:
+        if self._token is None:
+            self._token = _current.set(self)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        self.suspend() # a generator span closed from another context (e.g. garbage-collected stream) is just dropped
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        r = REGISTRY
+        if not r.enabled:
+            return
+        r.observe("span_seconds", self.duration, {"span": self.name, "status": "error" if self.error else "ok"},
+                  help="wall time per span")
+        r.recent.append({"name": self.name, "parent": self.parent, "start": time.time() - self.duration,
+                         "duration_s": self.duration, "error": self.error, **self.attrs})
+
+def span(name: str, **attrs: Any) -> Span:
+    return Span(name, **attrs)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def traced(name: str) -> Callable:
+    """decorator: run the function inside span(name)"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def record_ollama(raw: Optional[dict], s: Optional[Span] = None) -> None:
+    # ollama's final message carries token counts and nanosecond durations
+    if not raw:
+        return
+    model = {"model": str(raw.get("model", ""))}
+    for key, name in (("prompt_eval_count", "ollama_prompt_tokens"), ("eval_count", "ollama_eval_tokens")):
+        if raw.get(key) is not None:
+            REGISTRY.observe(name, float(raw[key]), model, buckets=TOKEN_BUCKETS, help="tokens per ollama call")
+    for key, name in (("prompt_eval_duration", "ollama_prompt_eval_seconds"), ("eval_duration", "ollama_eval_seconds"),
+                      ("load_duration", "ollama_load_seconds")):
+        if raw.get(key) is not None:
+            REGISTRY.observe(name, raw[key] / 1e9, model, help="duration reported by ollama")
+    if s is not None:
+        s.set(**{k: raw[k] for k in ("prompt_eval_count", "eval_count", "prompt_eval_duration", "eval_duration") if k in raw})
+
+def configure(cfg: Optional[dict]) -> None:
+    # tracing: {enabled, recent_spans} from config.yaml
+    cfg = cfg or {}
+    REGISTRY.enabled = bool(cfg.get("enabled", True))
+    n = int(cfg.get("recent_spans", REGISTRY.recent.maxlen or 200))
+    if n != REGISTRY.recent.maxlen:
+        REGISTRY.recent = deque(REGISTRY.recent, maxlen=n)
+
+def to_json() -> Dict[str, Any]:
+    return REGISTRY.to_json()
+
+def to_prometheus() -> str:
+    return REGISTRY.to_prometheus()
+
+def dump_json(path: str) -> None:
+    from pathlib import Path
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps(to_json(), ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,14 @@
+# tests/test_parser.py
+# classify() must agree with the original per-step pipeline on every input of the benchmark table
+# run: python -m pytest -q tests
+from __future__ import annotations
+import pytest
+
+from benchmarks.bench_parser import CASES, compiled, legacy
+
+def test_table_size():
+    assert len(CASES) == 52
+
+@pytest.mark.parametrize("text", CASES)
+def test_classify_matches_legacy(text):
+    assert compiled(text) == legacy(text)
@@ -0,0 +1,89 @@
+# tools/email/async_gmail.py
+# awaitable GmailProvider: every call runs on a bounded pool of worker threads, with a per-call timeout
+from __future__ import annotations
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .base import EmailHeader
+
+# seconds a caller waits for each kind of call (None = no limit)
+DEFAULT_TIMEOUTS: Dict[str, Optional[float]] = {"list": 20.0, "draft": 15.0, "send": 30.0}
+
+class GmailTimeout(TimeoutError):
+    """the call did not finish within its timeout; the caller gets control back, the request may still complete"""
+
+class AsyncGmailProvider:
+    """
+    AsyncEmailProvider on top of a (sync, possibly lazy) GmailProvider. The google client is blocking,
+    so calls run on max_workers dedicated threads (each with its own httplib2 connection, see
+    GmailProvider._thread_http); the event loop is never blocked and list / create / update / send
+    can overlap each other and LLM calls.
+
+    timeout: caller-side limit per call (per kind in `timeouts`, or per call). On timeout or
+    cancellation, a call that has not started yet is dropped; one already on the wire cannot be
+    interrupted and finishes in the background (GmailOAuthConfig.http_timeout_s bounds that).
+    A timed-out send_draft may therefore still have been sent.
+    """
+    name = "gmail"
+
+    def __init__(self, provider, max_workers: int = 8, timeouts: Optional[Dict[str, Optional[float]]] = None):
+        self.provider = provider
+        self.max_workers = max_workers
+        self.timeouts: Dict[str, Optional[float]] = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gmail-io")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": self.in_flight, "timed_out": self.timed_out, "cancelled": self.cancelled}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, key, getattr(self, key) + n)
+
+    def _invoke(self, method: str, *args, **kwargs) -> Any:
+        # runs on a worker: resolving the method may build a lazy provider (OAuth, discovery), off the loop
+        return getattr(self.provider, method)(*args, **kwargs)
+
+    async def _call(self, kind: str, method: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        limit = self.timeouts.get(kind) if timeout is None else timeout
+        # copy the context: spans opened by the sync provider nest under the caller's span
+        ctx = contextvars.copy_context()
+        fut = asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(ctx.run, self._invoke, method, *args, **kwargs))
+        self._count("in_flight")
+        try:
+            return await asyncio.wait_for(fut, limit)
+        except asyncio.TimeoutError:
+            self._count("timed_out")
+            raise GmailTimeout(f"gmail {method} took longer than {limit}s") from None
+        except asyncio.CancelledError:
+            self._count("cancelled")
+            raise
+        finally:
+            self._count("in_flight", -1)
+
+    # ---- AsyncEmailProvider ----
+    async def list_latest(self, limit: int = 10, query: Optional[str] = None, days: Optional[int] = None, *,
+                          timeout: Optional[float] = None) -> List[EmailHeader]:
+        return await self._call("list", "list_latest", limit, query=query, days=days, timeout=timeout)
+
+    async def create_draft(self, to: str, subject: str, body: str, *, timeout: Optional[float] = None) -> str:
+        return await self._call("draft", "create_draft", to, subject, body, timeout=timeout)
+
+    async def update_draft(self, draft_id: str, to: str, subject: str, body: str, *, timeout: Optional[float] = None) -> str:
+        return await self._call("draft", "update_draft", draft_id, to, subject, body, timeout=timeout)
+
+    async def send_draft(self, draft_id: str, *, timeout: Optional[float] = None) -> str:
+        return await self._call("send", "send_draft", draft_id, timeout=timeout)
+
+    async def aclose(self) -> None:
+        # queued calls are dropped, running ones are not waited for
+        self._executor.shutdown(wait=False, cancel_futures=True)
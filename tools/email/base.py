@@ -24,4 +24,21 @@ class EmailProvider(Protocol):
         "send a draft and return message_id"
         ...
     def update_draft(self, draft_id: str, to: str, subject: str, body: str) -> None:
-        ...
\ No newline at end of file
+        ...
+
+class AsyncEmailProvider(Protocol):
+    # same contract as EmailProvider, but awaitable: mailbox calls overlap each other and LLM calls on one event loop
+    name: str
+
+    async def list_latest(self, limit: int = 10, query: Optional[str] = None, days: Optional[int] = None, *,
+                          timeout: Optional[float] = None) -> List[EmailHeader]:
+        ...
+
+    async def create_draft(self, to: str, subject: str, body: str, *, timeout: Optional[float] = None) -> str:
+        ...
+
+    async def send_draft(self, draft_id: str, *, timeout: Optional[float] = None) -> str:
+        ...
+
+    async def update_draft(self, draft_id: str, to: str, subject: str, body: str, *, timeout: Optional[float] = None) -> None:
+        ...
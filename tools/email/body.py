@@ -0,0 +1,144 @@
+# tools/email/body.py
+# plain text of a gmail message (messages.get format=full): walk the MIME tree, decode only what fits the cap
+from __future__ import annotations
+import base64
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Iterator, List, Optional, Tuple
+
+CHUNK = 16 * 1024 # base64 characters decoded per step (multiple of 4)
+TRUNCATED = "\n…[truncated]"
+
+_BLOCK = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote", "pre", "hr"}
+_SKIP = {"script", "style", "head", "title"}
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANKS = re.compile(r"\n\s*\n\s*(\n\s*)+")
+
+class HtmlToText(HTMLParser):
+    """html -> readable text: block tags become line breaks, script / style dropped, entities decoded"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.size = 0
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP:
+            self._skip += 1
+        elif tag in _BLOCK:
+            self._add("\n")
+        elif tag == "td":
+            self._add(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK:
+            self._add("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._add(_SPACES.sub(" ", data))
+
+    def _add(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+    def text(self) -> str:
+        return _normalize("".join(self.parts))
+
+def _normalize(text: str) -> str:
+    lines = [l.strip() for l in text.replace("\r\n", "\n").split("\n")]
+    return _BLANKS.sub("\n\n", "\n".join(lines)).strip()
+
+def _header(part: dict, name: str) -> str:
+    for h in part.get("headers") or []:
+        if (h.get("name") or "").lower() == name:
+            return h.get("value") or ""
+    return ""
+
+def _charset(part: dict) -> str:
+    m = re.search(r"charset=\"?([\w.:-]+)", _header(part, "content-type"), flags=re.IGNORECASE)
+    try:
+        return codecs.lookup(m.group(1)).name if m else "utf-8"
+    except LookupError:
+        return "utf-8"
+
+def _leaves(part: dict) -> Iterator[dict]:
+    # depth first, document order; attachments (filename / attachmentId) are not text
+    if part.get("parts"):
+        for p in part["parts"]:
+            yield from _leaves(p)
+    elif not part.get("filename") and not (part.get("body") or {}).get("attachmentId"):
+        yield part
+
+def _decode(part: dict) -> Iterator[str]:
+    # base64url -> bytes -> text, one chunk at a time, so a huge part is only decoded as far as it is read
+    data = (part.get("body") or {}).get("data") or ""
+    dec = codecs.getincrementaldecoder(_charset(part))(errors="replace")
+    for start in range(0, len(data), CHUNK):
+        piece = data[start:start + CHUNK]
+        if start + CHUNK >= len(data):
+            piece += "=" * (-len(piece) % 4) # gmail drops the padding
+        yield dec.decode(base64.urlsafe_b64decode(piece))
+    yield dec.decode(b"", final=True)
+
+def _read(part: dict, max_chars: int) -> tuple[str, bool]:
+    """(text, cut): text/plain as is, text/html converted; decoding stops once max_chars is reached"""
+    conv = HtmlToText() if part.get("mimeType") == "text/html" else None
+    out: List[str] = []
+    size = 0
+    cut = False
+    for piece in _decode(part):
+        if conv is not None:
+            conv.feed(piece)
+            size = conv.size
+        else:
+            out.append(piece)
+            size += len(piece)
+        if size > max_chars:
+            cut = True # the rest of the part is never decoded
+            break
+    if conv is not None:
+        conv.close()
+        text = conv.text()
+    else:
+        text = _normalize("".join(out))
+    return text[:max_chars], cut or len(text) > max_chars
+
+def extract_body(payload: dict, max_chars: int = 4000) -> Tuple[str, bool]:
+    """
+    (text, complete): readable body of a format=full payload, at most max_chars (+ a truncation marker).
+    Prefers text/plain; text/html is converted only when a message has no plain part.
+    complete is False when anything was cut, however short the text is after whitespace collapse.
+    """
+    leaves = list(_leaves(payload or {}))
+    plain = [p for p in leaves if p.get("mimeType") == "text/plain"]
+    html = [p for p in leaves if p.get("mimeType") == "text/html"]
+    texts: List[str] = []
+    left = max_chars
+    cut = False
+    for part in plain or html[:1]: # alternative html copies of the plain parts are skipped
+        if left <= 0:
+            cut = True
+            break
+        text, cut = _read(part, left)
+        if text:
+            texts.append(text)
+            left -= len(text)
+        if cut:
+            break
+    body = "\n\n".join(texts)
+    return (body + TRUNCATED, False) if cut else (body, True)
+
+def extract_text(payload: dict, max_chars: int = 4000) -> str:
+    return extract_body(payload, max_chars)[0]
+
+def message_body(msg: dict, max_chars: int = 4000) -> Optional[Tuple[str, bool]]:
+    payload = msg.get("payload")
+    return extract_body(payload, max_chars) if payload else None
+
+def message_text(msg: dict, max_chars: int = 4000) -> Optional[str]:
+    body = message_body(msg, max_chars)
+    return body[0] if body else None
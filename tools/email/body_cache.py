@@ -0,0 +1,70 @@
+# tools/email/body_cache.py
+# extracted message bodies keyed by gmail message id, zlib-compressed (a message body never changes)
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .body import TRUNCATED
+
+def _cap(text: str, max_chars: int) -> str:
+    # a body stored whole or at a larger cap is cut to this call's cap, same marker as extract_body
+    cut = text.endswith(TRUNCATED)
+    if cut:
+        text = text[:-len(TRUNCATED)]
+    if len(text) > max_chars:
+        text, cut = text[:max_chars], True
+    return text + TRUNCATED if cut else text
+
+class BodyCache:
+    def __init__(self, path: Optional[str] = "data/message_bodies.sqlite3", level: int = 6):
+        # path=None keeps the cache in memory only
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        # max_chars: the cap the body was fetched with; complete: nothing was cut at that cap.
+        # An incomplete body is fetched again for a larger cap.
+        self._db.execute("CREATE TABLE IF NOT EXISTS bodies (id TEXT PRIMARY KEY, body BLOB, size INTEGER, "
+                         "max_chars INTEGER, created REAL, complete INTEGER NOT NULL DEFAULT 0)")
+        cols = {row[1] for row in self._db.execute("PRAGMA table_info(bodies)")}
+        if "complete" not in cols: # cache written before the flag: rows count as cut
+            self._db.execute("ALTER TABLE bodies ADD COLUMN complete INTEGER NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: Iterable[str], max_chars: int) -> Dict[str, str]:
+        ids = list(ids)
+        out: Dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500): # sqlite caps the number of bound parameters
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(f"SELECT id, body, max_chars, complete FROM bodies WHERE id IN ({marks})", chunk)
+                for msg_id, blob, cap, complete in rows:
+                    # usable if it was complete, or cut at a cap at least as large as this one
+                    if complete or cap >= max_chars:
+                        out[msg_id] = _cap(zlib.decompress(blob).decode("utf-8"), max_chars)
+        return out
+
+    def put_many(self, items: Dict[str, Tuple[str, bool]], max_chars: int) -> None:
+        # items: id -> (text, complete) as returned by body.extract_body
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO bodies(id, body, size, max_chars, created, complete) VALUES (?,?,?,?,?,?)",
+                [(k, zlib.compress(v.encode("utf-8"), self.level), len(v), max_chars, now, int(complete))
+                 for k, (v, complete) in items.items()],
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n, raw, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM bodies").fetchone()
+        return {"messages": n, "chars": raw, "stored_bytes": stored}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM bodies").fetchone()[0]
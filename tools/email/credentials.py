@@ -0,0 +1,95 @@
+# tools/email/credentials.py
+# OAuth credentials for gmail: refresh only when needed, in the background, and touch the token file only on change
+from __future__ import annotations
+import datetime as dt
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+
+class CredentialManager:
+    def __init__(self, token_path: str, credentials_path: str, scopes: List[str], refresh_margin_s: float = 300):
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.scopes = scopes
+        self.refresh_margin_s = refresh_margin_s # refresh this long before the access token expires
+        self.creds: Optional[Credentials] = None
+        self._saved_json: Optional[str] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def seconds_left(self) -> Optional[float]:
+        if self.creds is None or self.creds.expiry is None:
+            return None
+        # google-auth keeps expiry as naive UTC
+        return (self.creds.expiry - dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    def _needs_refresh(self) -> bool:
+        left = self.seconds_left()
+        return left is not None and left <= self.refresh_margin_s
+
+    def load(self) -> Credentials:
+        creds: Credentials | None = None
+        try:
+            self._saved_json = Path(self.token_path).read_text(encoding="utf-8")
+            creds = Credentials.from_authorized_user_info(json.loads(self._saved_json), self.scopes)
+        except Exception:
+            creds = None
+
+        self.creds = creds
+        if creds and creds.refresh_token and (creds.expired or self._needs_refresh()):
+            self.refresh()
+        elif not creds or not creds.valid:
+            flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, self.scopes) #a process controller of OAuth authorization
+            #local server auth: opens brower once
+            self.creds = flow.run_local_server(port=0)
+            self.save_if_changed()
+        return self.creds
+
+    def refresh(self) -> None:
+        with self._lock:
+            self.creds.refresh(Request())
+            self.save_if_changed()
+
+    def save_if_changed(self) -> bool:
+        data = self.creds.to_json()
+        if data == self._saved_json:
+            return False
+        tmp = f"{self.token_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.token_path)
+        self._saved_json = data
+        return True
+
+    # ---- background refresh ----
+    def start_background_refresh(self) -> None:
+        if self.creds is None or not self.creds.refresh_token:
+            return
+        left = self.seconds_left()
+        delay = 60.0 if left is None else max(left - self.refresh_margin_s, 0.0)
+        self._timer = threading.Timer(delay, self._background_tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_tick(self) -> None:
+        try:
+            if self._needs_refresh():
+                self.refresh()
+        except Exception:
+            pass # network hiccup: the next tick (or the 401 handler of the http client) retries
+        finally:
+            left = self.seconds_left()
+            delay = 60.0 if left is None else max(left - self.refresh_margin_s, 30.0)
+            self._timer = threading.Timer(delay, self._background_tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
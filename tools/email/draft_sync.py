@@ -0,0 +1,109 @@
+# tools/email/draft_sync.py
+# write-behind queue for drafts.update: revisions are coalesced and uploaded after a quiet period
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+_Version = Tuple[str, str, str] # to, subject, body
+
+class DraftSyncQueue:
+    """
+    submit() only records the newest version of a draft; a worker uploads it once the draft has been
+    quiet for debounce_s, so back-to-back revisions cost one drafts.update.
+    flush() uploads synchronously and must be called before sending a draft.
+    close() flushes and stops the worker; submit() after that raises RuntimeError.
+    """
+    def __init__(self, provider, debounce_s: float = 2.0):
+        self.provider = provider
+        self.debounce_s = debounce_s
+        self._pending: Dict[str, _Version] = {}
+        self._due: Dict[str, float] = {}
+        self._errors: Dict[str, Exception] = {}
+        self._draft_locks: Dict[str, threading.Lock] = {}
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self.submitted = 0
+        self.uploads = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"submitted": self.submitted, "uploads": self.uploads, "pending": len(self._pending)}
+
+    def submit(self, draft_id: str, to: str, subject: str, body: str) -> None:
+        with self._cond:
+            if self._closed:
+                # the worker has exited: a version queued now would never be uploaded
+                raise RuntimeError("draft sync queue is closed")
+            self._pending[draft_id] = (to, subject, body) # older pending version is simply replaced
+            self._due[draft_id] = time.monotonic() + self.debounce_s
+            self.submitted += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="draft-sync", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def _draft_lock(self, draft_id: str) -> threading.Lock:
+        with self._cond:
+            return self._draft_locks.setdefault(draft_id, threading.Lock())
+
+    def _upload(self, draft_id: str) -> None:
+        # the per-draft lock keeps uploads of one draft in order: whoever pops a version uploads it
+        # before anyone can pop (and upload) a newer one
+        with self._draft_lock(draft_id):
+            with self._cond:
+                version = self._pending.pop(draft_id, None)
+                self._due.pop(draft_id, None)
+            if version is None:
+                return
+            try:
+                self.provider.update_draft(draft_id, *version)
+            except Exception as e:
+                with self._cond:
+                    self._errors[draft_id] = e
+                    if draft_id not in self._pending: # retry later unless a newer version replaced it
+                        self._pending[draft_id] = version
+                        self._due[draft_id] = time.monotonic() + self.debounce_s
+                        self._cond.notify()
+                raise
+            with self._cond:
+                self._errors.pop(draft_id, None)
+                self.uploads += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    ready = [d for d, t in self._due.items() if t <= now]
+                    if ready:
+                        break
+                    timeout = min(self._due.values()) - now if self._due else None
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            for draft_id in ready:
+                try:
+                    self._upload(draft_id)
+                except Exception:
+                    pass # kept in _errors, re-raised by flush()
+
+    def flush(self, draft_id: Optional[str] = None) -> None:
+        """Upload now (one draft or all); raises if the upload fails."""
+        with self._cond:
+            ids: List[str] = [draft_id] if draft_id else list(self._pending)
+        for d in ids:
+            self._upload(d)
+            with self._cond:
+                err = self._errors.get(d)
+            if err is not None:
+                raise err
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify()
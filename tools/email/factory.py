@@ -1,9 +1,39 @@
 from __future__ import annotations
-from typing import Any, Dict
+import threading
+from typing import Any, Callable, Dict
 
-from .gamil_provider import GmailProvider, GmailOAuthConfig
+class LazyEmailProvider:
+    """
+    Stands in for an EmailProvider and builds the real one (imports + OAuth + service) on first use,
+    so sessions that never touch email never pay for it.
+    """
+    def __init__(self, build: Callable[[], Any]):
+        self._build = build
+        self._provider = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._provider is not None
+
+    def get(self):
+        if self._provider is None:
+            with self._lock:
+                if self._provider is None:
+                    self._provider = self._build()
+        return self._provider
+
+    def __getattr__(self, name: str):
+        # only called for attributes LazyEmailProvider itself doesn't have
+        return getattr(self.get(), name)
+
+def build_email_provider(cfg: Dict[str, Any], lazy: bool = False, *, asynchronous: bool = False):
+    # asynchronous=True returns an AsyncEmailProvider (awaitable methods) around the same provider
+    if asynchronous:
+        return _build_async(cfg, build_email_provider(cfg, lazy=lazy))
+    if lazy:
+        return LazyEmailProvider(lambda: build_email_provider(cfg))
 
-def build_email_provider(cfg: Dict[str, Any]):
     email_cfg = cfg.get("email", {})
     default_name = email_cfg.get("default_provider", "gmail")
     providers = email_cfg.get("providers", {})
@@ -14,9 +44,40 @@ def build_email_provider(cfg: Dict[str, Any]):
 
     ptype = p.get("type")
     if ptype == "gmail_oauth":
+        # imported here: the google client stack is slow to import
+        from .gamil_provider import GmailProvider, GmailOAuthConfig
+        mirror = None
+        mcfg = p.get("mirror") or {}
+        if mcfg.get("enabled", False):
+            from .mirror import InboxMirror
+            mirror = InboxMirror(
+                path=mcfg.get("path", "data/inbox_mirror.sqlite3"),
+                max_age_s=float(mcfg.get("max_age_s", 60)),
+                window_days=int(mcfg.get("window_days", 30)),
+                max_messages=int(mcfg.get("max_messages", 500)),
+            )
+        body_cache = None
+        bcfg = p.get("bodies") or {}
+        full_bodies = int((email_cfg.get("summarize") or {}).get("full_bodies", 0))
+        if full_bodies > 0 and bcfg.get("cache", True): # no sqlite file while full bodies are off
+            from .body_cache import BodyCache
+            body_cache = BodyCache(bcfg.get("cache_path", "data/message_bodies.sqlite3"))
         return GmailProvider(GmailOAuthConfig(
             credentials_path=p["credentials_path"],
             token_path=p["token_path"],
-        ))
+            discovery_path=p.get("discovery_path"),
+            refresh_margin_s=float(p.get("refresh_margin_s", 300)),
+            http_timeout_s=float(p["http_timeout_s"]) if p.get("http_timeout_s") else None,
+        ), mirror=mirror, body_cache=body_cache)
+
+    raise ValueError(f"Unknown email provider type: {ptype}")
 
-    raise ValueError(f"Unknown email provider type: {ptype}") 
\ No newline at end of file
+def _build_async(cfg: Dict[str, Any], provider):
+    email_cfg = cfg.get("email", {})
+    p = (email_cfg.get("providers", {}) or {}).get(email_cfg.get("default_provider", "gmail")) or {}
+    acfg = p.get("async") or {}
+    if p.get("type") == "gmail_oauth":
+        from .async_gmail import AsyncGmailProvider
+        timeouts = {k: (float(v) if v is not None else None) for k, v in (acfg.get("timeouts_s") or {}).items()}
+        return AsyncGmailProvider(provider, max_workers=int(acfg.get("max_workers", 8)), timeouts=timeouts)
+    raise ValueError(f"No async email provider for type: {p.get('type')}")
@@ -1,17 +1,28 @@
 from __future__ import annotations
 
 import base64
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional
 
 from email.message import EmailMessage
 
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
 
 from .base import EmailHeader
+from .body import message_body
+from .credentials import CredentialManager
+from server.tracing import traced
+
+# gmail accepts up to 100 calls per batch, but recommends <= 50 (bigger batches get rate limited)
+BATCH_LIMIT = 50
+# threads used when the batch endpoint fails and messages are fetched one by one
+FALLBACK_WORKERS = 8
+METADATA_HEADERS = ["From","Subject","Date"]
 
 SCOPES = [
     "https://www.googleapis.com/auth/gmail.readonly",
@@ -32,72 +43,172 @@ def _get_header(headers: list[dict],name: str)-> str:
 class GmailOAuthConfig:
     credentials_path :str
     token_path: str
+    discovery_path: Optional[str] = None # local copy of the gmail discovery document
+    refresh_margin_s: float = 300 # refresh the access token this long before it expires
+    http_timeout_s: Optional[float] = None # socket timeout of every request (None: httplib2 default, no limit)
+
+def build_gmail_service(creds, discovery_path: Optional[str] = None):
+    """
+    Build the gmail service without fetching the discovery document over the network:
+    local copy first, then the copy bundled with googleapiclient, and only then the network (result saved locally).
+    """
+    if discovery_path and Path(discovery_path).exists():
+        return build_from_document(Path(discovery_path).read_text(encoding="utf-8"), credentials=creds)
+    try:
+        service = build("gmail", "v1", credentials=creds, static_discovery=True, cache_discovery=False)
+    except Exception:
+        service = build("gmail", "v1", credentials=creds, static_discovery=False, cache_discovery=False)
+    if discovery_path:
+        Path(discovery_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(discovery_path).write_text(json.dumps(service._rootDesc), encoding="utf-8")
+    return service
+
+def _header_from_message(msg_id: str, full: dict) -> EmailHeader:
+    headers = full.get("payload",{}).get("headers",[])or []
+    return EmailHeader(
+        id = full.get("id",msg_id),
+        thread_id = full.get("threadId"),
+        from_ = _get_header(headers,"From"),
+        subject=_get_header(headers, "Subject"),
+        date=_get_header(headers, "Date"),
+        snippet=full.get("snippet", "") or "",
+    )
 
 class GmailProvider:
     name = "gmail"
 
-    def __init__(self,cfg:GmailOAuthConfig):
+    def __init__(self,cfg:GmailOAuthConfig, service=None, mirror=None, body_cache=None):
         self.cfg = cfg
-        self.service = self._build_service()
+        self.mirror = mirror # optional InboxMirror: answers list_latest locally
+        self.body_cache = body_cache # optional BodyCache: every full body is downloaded once
+        self.creds: Credentials | None = None
+        self.credentials: CredentialManager | None = None
+        self._local = threading.local()
+        # service can be injected (tests / benchmarks against a fake server), otherwise OAuth + build
+        self.service = service if service is not None else self._build_service()
     
     def _build_service(self):
-        creds :Credentials |None = None
-        
-        try:
-            creds = Credentials.from_authorized_user_file(self.cfg.token_path, SCOPES)
-        except Exception:
-            creds = None 
-        
-        #refresh/login
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        elif not creds or not creds.valid: 
-            flow = InstalledAppFlow.from_client_secrets_file(self.cfg.credentials_path,SCOPES) #a process controller of OAuth authorization
-            #local server auth: opens brower once
-            creds = flow.run_local_server(port =0)
-            #flow(once)-> Credentials(long term)
-
-        #save token
-        with open(self.cfg.token_path,'w',encoding = 'utf-8') as f:
-            f.write(creds.to_json())
-        
-        return build("gmail", "v1", credentials= creds)
+        # token is refreshed only when (nearly) expired, written only when it changed,
+        # and kept fresh by a background timer afterwards
+        self.credentials = CredentialManager(
+            token_path=self.cfg.token_path,
+            credentials_path=self.cfg.credentials_path,
+            scopes=SCOPES,
+            refresh_margin_s=self.cfg.refresh_margin_s,
+        )
+        self.creds = self.credentials.load()
+        self.credentials.start_background_refresh()
+        return build_gmail_service(self.creds, self.cfg.discovery_path)
+
+    def _thread_http(self):
+        # httplib2 connections are not thread safe: every calling thread gets its own,
+        # so several sessions / workers can use one provider at the same time
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import httplib2
+            if self.creds is not None:
+                from google_auth_httplib2 import AuthorizedHttp
+                http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=self.cfg.http_timeout_s))
+            else:
+                http = httplib2.Http(timeout=self.cfg.http_timeout_s)
+            self._local.http = http
+        return http
+
+    @traced("gmail.execute")
+    def _execute(self, request):
+        return request.execute(http=self._thread_http())
+
+    def _metadata_request(self, msg_id: str):
+        return self.service.users().messages().get(
+            userId = "me",
+            id = msg_id,
+            format = "metadata",
+            metadataHeaders = METADATA_HEADERS,
+        )
+
+    def _full_request(self, msg_id: str):
+        return self.service.users().messages().get(userId="me", id=msg_id, format="full")
+
+    @traced("gmail.fetch_metadata")
+    def _fetch_metadata(self, ids: List[str]) -> Dict[str, dict]:
+        return self._fetch_many(ids, self._metadata_request)
+
+    def _fetch_many(self, ids: List[str], make_request) -> Dict[str, dict]:
+        """
+        messages.get for many ids: one batch HTTP call per BATCH_LIMIT ids.
+        Anything the batch did not return (batch error, per-call 429/5xx) is fetched by a small thread pool.
+        """
+        results: Dict[str, dict] = {}
+        unique = list(dict.fromkeys(ids)) # batch request ids must be unique
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+
+        for start in range(0, len(unique), BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for msg_id in unique[start:start + BATCH_LIMIT]:
+                batch.add(make_request(msg_id), request_id=msg_id)
+            try:
+                batch.execute(http=self._thread_http())
+            except Exception:
+                pass # only this chunk goes through the fallback below, the next chunks are still batched
+
+        missing = [i for i in unique if i not in results]
+        if missing:
+            reqs = [make_request(i) for i in missing] # built here, executed in the pool
+            workers = min(FALLBACK_WORKERS, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                fetched = pool.map(self._execute, reqs)
+                results.update(zip(missing, fetched))
+        return results
     
+    @traced("gmail.fetch_bodies")
+    def fetch_bodies(self, ids: List[str], max_chars: int = 4000) -> Dict[str, str]:
+        """
+        Plain-text body (at most max_chars) per message id. Cached bodies come from body_cache, the rest
+        with messages.get(format=full) in batches; the MIME tree is decoded only up to the cap.
+        """
+        out = self.body_cache.get_many(ids, max_chars) if self.body_cache is not None else {}
+        missing = [i for i in dict.fromkeys(ids) if i not in out]
+        if missing:
+            fresh = {}
+            for msg_id, full in self._fetch_many(missing, self._full_request).items():
+                body = message_body(full, max_chars)
+                if body is not None:
+                    fresh[msg_id] = body
+            if self.body_cache is not None:
+                self.body_cache.put_many(fresh, max_chars)
+            out.update((k, text) for k, (text, _) in fresh.items())
+        return out
+
+    @traced("gmail.list_latest")
     def list_latest(self, limit: int = 10, query: Optional[str] = None, days: Optional[int] = None) -> List[EmailHeader]:
+        # gmail search syntax can't be evaluated locally, so only plain listings come from the mirror
+        if self.mirror is not None and not query and self.mirror.covers(days):
+            self.mirror.ensure_fresh(self)
+            return self.mirror.query(limit=limit, days=days)
+
         user_id = "me"
         q_parts = []
         if days is not None:
             q_parts.append(f"newer_than:{days}d")
         if query:
             q_parts.append(query)
-        q = "".join(q_parts).strip()
-        resp  = self.service.users().messages().list(
+        q = " ".join(q_parts).strip()
+        resp  = self._execute(self.service.users().messages().list(
             userId = user_id, 
             q=q, 
             labelIds = ["INBOX"],
             includeSpamTrash = False,
-            maxResults= limit).execute()
+            maxResults= limit))
         msgs = resp.get("messages", []) or []
 
-        out: List[EmailHeader] = []
-        for m in msgs:
-            msg_id = m["id"]
-            full = self.service.users().messages().get( 
-                userId = user_id,
-                id = msg_id,
-                format = "metadata",
-                metadataHeaders = ["From","Subject","Date"],
-            ).execute()
-            headers = full.get("payload",{}).get("headers",[])or []
-            out.append(EmailHeader(
-                id = full.get("id",msg_id),
-                thread_id = full.get("threadId"),
-                from_ = _get_header(headers,"From"),
-                subject=_get_header(headers, "Subject"),
-                date=_get_header(headers, "Date"),
-                snippet=full.get("snippet", "") or "",
-            ))
-        return out
+        # one batched round trip instead of one messages.get per message; output keeps the list order
+        ids = [m["id"] for m in msgs]
+        fulls = self._fetch_metadata(ids)
+        return [_header_from_message(msg_id, fulls[msg_id]) for msg_id in ids]
+    @traced("gmail.create_draft")
     def create_draft(self, to: str, subject: str, body: str) -> str:
         user_id = "me"
 
@@ -111,15 +222,17 @@ class GmailProvider:
         raw_b64 = base64.urlsafe_b64encode(raw_bytes).decode("utf-8")
 
         draft_body = {"message": {"raw": raw_b64}}
-        draft = self.service.users().drafts().create(userId=user_id, body=draft_body).execute()
+        draft = self._execute(self.service.users().drafts().create(userId=user_id, body=draft_body))
         return draft.get("id")
+    @traced("gmail.send_draft")
     def send_draft (self, draft_id: str)-> str:
         user_id = "me"
-        resp = self.service.users().drafts().send(
+        resp = self._execute(self.service.users().drafts().send(
             userId =user_id,
             body={"id": draft_id}
-        ).execute()
+        ))
         return resp.get("id", "")
+    @traced("gmail.update_draft")
     def update_draft(self, draft_id: str, to: str, subject: str, body: str) -> str:
         user_id = "me"
 
@@ -137,10 +250,10 @@ class GmailProvider:
             "message": {"raw": raw_b64},
         }
 
-        draft = self.service.users().drafts().update(
+        draft = self._execute(self.service.users().drafts().update(
             userId=user_id,
             id=draft_id,
             body=draft_body
-        ).execute()
+        ))
 
         return draft.get("id", draft_id)
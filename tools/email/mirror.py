@@ -0,0 +1,195 @@
+# tools/email/mirror.py
+# local SQLite copy of the inbox headers, kept current with the Gmail history API
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .base import EmailHeader
+
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    from_ TEXT,
+    subject TEXT,
+    date TEXT,
+    snippet TEXT,
+    internal_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_messages_internal ON messages(internal_ms DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def _http_status(e: Exception) -> Optional[int]:
+    # googleapiclient.errors.HttpError keeps the response in .resp
+    return getattr(getattr(e, "resp", None), "status", None)
+
+class InboxMirror:
+    """
+    First sync lists the INBOX of the last window_days (max max_messages) and stores the headers.
+    Later syncs only pull history since the stored historyId; a 404 (history too old) triggers a full resync.
+    After every sync, messages older than window_days and all but the newest max_messages are dropped.
+    """
+    def __init__(self, path: str = "data/inbox_mirror.sqlite3", max_age_s: float = 60,
+                 window_days: int = 30, max_messages: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age_s = max_age_s
+        self.window_days = window_days
+        self.max_messages = max_messages
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    # ---- meta ----
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def history_id(self) -> Optional[str]:
+        with self._lock:
+            return self._meta("history_id")
+
+    @property
+    def last_sync(self) -> float:
+        with self._lock:
+            return float(self._meta("last_sync") or 0)
+
+    def is_stale(self) -> bool:
+        return time.time() - self.last_sync > self.max_age_s
+
+    def covers(self, days: Optional[int]) -> bool:
+        # the mirror only holds window_days of mail: older ranges, and unbounded listings (days=None), go to the network
+        return days is not None and days <= self.window_days
+
+    # ---- sync ----
+    def ensure_fresh(self, provider) -> None:
+        with self._lock:
+            if self.is_stale():
+                self.sync(provider)
+
+    def sync(self, provider, full: bool = False) -> None:
+        with self._lock:
+            if full or not self.history_id:
+                self._full_sync(provider)
+                return
+            try:
+                self._incremental_sync(provider)
+            except Exception as e:
+                if _http_status(e) != 404:
+                    raise
+                self._full_sync(provider)
+
+    def _store(self, fulls: Dict[str, dict]) -> None:
+        from .gamil_provider import _header_from_message
+        rows = []
+        for msg_id, full in fulls.items():
+            h = _header_from_message(msg_id, full)
+            rows.append((h.id, h.thread_id, h.from_, h.subject, h.date, h.snippet, int(full.get("internalDate") or 0)))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO messages(id, thread_id, from_, subject, date, snippet, internal_ms) VALUES (?,?,?,?,?,?,?)",
+            rows,
+        )
+
+    def _trim(self) -> None:
+        # keep the mirror to what a full sync would hold: window_days, newest max_messages
+        cutoff = int((time.time() - self.window_days * 86400) * 1000)
+        self._db.execute("DELETE FROM messages WHERE internal_ms < ?", (cutoff,))
+        self._db.execute(
+            "DELETE FROM messages WHERE id NOT IN (SELECT id FROM messages ORDER BY internal_ms DESC LIMIT ?)",
+            (self.max_messages,),
+        )
+
+    def _full_sync(self, provider) -> None:
+        users = provider.service.users()
+        # read historyId before listing: changes that land while we list are replayed by the next sync
+        history_id = provider._execute(users.getProfile(userId="me"))["historyId"]
+        ids: List[str] = []
+        page_token = None
+        while len(ids) < self.max_messages:
+            resp = provider._execute(users.messages().list(
+                userId="me",
+                q=f"newer_than:{self.window_days}d",
+                labelIds=["INBOX"],
+                includeSpamTrash=False,
+                maxResults=min(500, self.max_messages - len(ids)),
+                pageToken=page_token,
+            ))
+            ids.extend(m["id"] for m in resp.get("messages", []) or [])
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
+        fulls = provider._fetch_metadata(ids)
+        with self._db:
+            self._db.execute("DELETE FROM messages")
+            self._store(fulls)
+            self._trim()
+            self._set_meta("history_id", str(history_id))
+            self._set_meta("last_sync", str(time.time()))
+
+    def _incremental_sync(self, provider) -> None:
+        users = provider.service.users()
+        in_inbox: Dict[str, bool] = {} # last known state per message id, events are replayed in order
+        latest = self.history_id
+        page_token = None
+        while True:
+            resp = provider._execute(users.history().list(
+                userId="me",
+                startHistoryId=self.history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token,
+            ))
+            for h in resp.get("history", []) or []:
+                for a in h.get("messagesAdded", []) or []:
+                    m = a["message"]
+                    if "INBOX" in (m.get("labelIds") or []):
+                        in_inbox[m["id"]] = True
+                for d in h.get("messagesDeleted", []) or []:
+                    in_inbox[d["message"]["id"]] = False
+                for a in h.get("labelsAdded", []) or []:
+                    if "INBOX" in (a.get("labelIds") or []):
+                        in_inbox[a["message"]["id"]] = True
+                for r in h.get("labelsRemoved", []) or []:
+                    if "INBOX" in (r.get("labelIds") or []):
+                        in_inbox[r["message"]["id"]] = False
+            latest = resp.get("historyId", latest)
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
+
+        added = [i for i, inside in in_inbox.items() if inside]
+        removed = [i for i, inside in in_inbox.items() if not inside]
+        fulls = provider._fetch_metadata(added) if added else {}
+        with self._db:
+            if removed:
+                self._db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in removed])
+            self._store(fulls)
+            self._trim()
+            self._set_meta("history_id", str(latest))
+            self._set_meta("last_sync", str(time.time()))
+
+    # ---- read ----
+    def query(self, limit: int = 10, days: Optional[int] = None) -> List[EmailHeader]:
+        sql = "SELECT id, thread_id, from_, subject, date, snippet FROM messages"
+        args: list = []
+        if days is not None:
+            sql += " WHERE internal_ms >= ?"
+            args.append(int((time.time() - days * 86400) * 1000))
+        sql += " ORDER BY internal_ms DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [EmailHeader(id=r[0], thread_id=r[1], from_=r[2], subject=r[3], date=r[4], snippet=r[5]) for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()